@@ -0,0 +1,147 @@
+import asyncio, math, os, time
+from collections import deque
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from starlette.responses import StreamingResponse
+import metrics
+
+# Requests of all classes running at once in this process
+ADMISSION_MAX_ACTIVE = int(os.getenv("ADMISSION_MAX_ACTIVE", "64"))
+
+
+class RequestClass:
+    """
+    Limits for one endpoint class. Lower `priority` is admitted first.
+    `max_active` caps how many of the shared slots the class may hold,
+    `queue_size` how many may wait, and `deadline` how long (seconds).
+    """
+
+    def __init__(self, name: str, priority: int, max_active: int, queue_size: int, deadline: float):
+        prefix = f"ADMISSION_{name.upper()}_"
+        self.name = name
+        self.priority = priority
+        self.max_active = int(os.getenv(prefix + "MAX_ACTIVE", max_active))
+        self.queue_size = int(os.getenv(prefix + "QUEUE", queue_size))
+        self.deadline = float(os.getenv(prefix + "DEADLINE", deadline))
+        self.active = 0
+        self.waiters = deque()
+        # Moving average of seconds a slot is held, for Retry-After
+        self.service_time = 1.0
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that gives its admission slot back however the
+    response ends: completed, client disconnect or an error in the body.
+    Starlette skips `background` tasks in the latter two cases.
+    """
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+class AdmissionController:
+    """
+    Bounded, prioritized admission in front of the LLM and OCR stages.
+    Full queues are rejected with 429 right away; requests that wait past
+    their class deadline get 503. Both carry a Retry-After estimate.
+    Runs on the event loop, so no locking is needed.
+    """
+
+    def __init__(self, classes, max_active: int = ADMISSION_MAX_ACTIVE):
+        self.classes = {c.name: c for c in classes}
+        self.max_active = max_active
+        self.active = 0
+
+    def _can_run(self, cls: RequestClass) -> bool:
+        return self.active < self.max_active and cls.active < cls.max_active
+
+    def _retry_after(self, cls: RequestClass) -> int:
+        return max(1, math.ceil(cls.service_time * (len(cls.waiters) + 1) / max(cls.max_active, 1)))
+
+    def _reject(self, cls: RequestClass, status_code: int, reason: str):
+        metrics.admission_rejected.inc(request_class=cls.name, reason=reason)
+        return HTTPException(
+            status_code=status_code,
+            detail=f"Server busy ({cls.name} {reason}), retry later",
+            headers={"Retry-After": str(self._retry_after(cls))}
+        )
+
+    def _grant(self, cls: RequestClass):
+        self.active += 1
+        cls.active += 1
+
+    def _release(self, cls: RequestClass, held: float):
+        self.active -= 1
+        cls.active -= 1
+        cls.service_time = 0.8 * cls.service_time + 0.2 * held
+        self._wake()
+
+    def _wake(self):
+        # Hand free slots to waiters, highest priority class first
+        for cls in sorted(self.classes.values(), key=lambda c: c.priority):
+            while cls.waiters and self._can_run(cls):
+                waiter = cls.waiters.popleft()
+                if not waiter.done():
+                    self._grant(cls)
+                    waiter.set_result(True)
+
+    async def acquire(self, name: str):
+        cls = self.classes[name]
+        began = time.perf_counter()
+        if self._can_run(cls) and not cls.waiters:
+            self._grant(cls)
+        else:
+            if len(cls.waiters) >= cls.queue_size:
+                raise self._reject(cls, 429, "queue full")
+            waiter = asyncio.get_running_loop().create_future()
+            cls.waiters.append(waiter)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), cls.deadline)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.done() and not waiter.cancelled():
+                    # Granted just as we gave up; pass the slot on
+                    self._release(cls, 0.0)
+                else:
+                    waiter.cancel()
+                    if waiter in cls.waiters:
+                        cls.waiters.remove(waiter)
+                if isinstance(e, asyncio.TimeoutError):
+                    raise self._reject(cls, 503, "queue deadline exceeded")
+                raise
+        metrics.admission_wait_seconds.observe(time.perf_counter() - began, request_class=name)
+        return cls
+
+    @asynccontextmanager
+    async def slot(self, name: str):
+        cls = await self.acquire(name)
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(cls, time.perf_counter() - began)
+
+    async def streaming_response(self, name: str, content, **kwargs) -> StreamingResponse:
+        """
+        Acquire a slot and stream `content` while holding it; the slot is
+        released in a finally once the response is done.
+        """
+        cls = await self.acquire(name)
+        began = time.perf_counter()
+        return AdmittedStreamingResponse(
+            content, lambda: self._release(cls, time.perf_counter() - began), **kwargs
+        )
+
+
+admission = AdmissionController([
+    RequestClass("text", priority=0, max_active=64, queue_size=256, deadline=10),
+    RequestClass("image", priority=1, max_active=8, queue_size=32, deadline=20),
+    RequestClass("batch", priority=2, max_active=4, queue_size=8, deadline=30),
+])
@@ -0,0 +1,190 @@
+"""
+Offline throughput benchmark. Runs the FastAPI app in-process with a stub
+LLM and OCR, a throwaway SQLite database and no network access:
+
+    cd backend
+    python -m bench.run --concurrency 1,8,32 --requests 200 --llm-latency 0.4
+
+Reports req/s and p50/p95/p99 latency per target and per pipeline stage.
+"""
+import argparse, asyncio, json, os, sys, tempfile, time
+from datetime import datetime, timedelta
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus.jsonl")
+TARGETS = ("text", "image", "schedule", "normalize")
+SCHEDULE_START = datetime(2030, 1, 1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default=",".join(TARGETS), help="comma separated subset of %(default)s")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per target and level")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub LLM seconds per call")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="+/- seconds, deterministic per prompt")
+    parser.add_argument("--ocr-latency", type=float, default=0.2, help="stub OCR seconds per image")
+    parser.add_argument("--cache", action="store_true", help="keep the stage/OCR caches enabled")
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--json", dest="json_path", help="also write results to this file")
+    return parser.parse_args(argv)
+
+def load_corpus(path: str):
+    corpus = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                corpus.setdefault(entry["kind"], []).append(entry)
+    return corpus
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+def parse_server_timing(header: str) -> dict:
+    timings = {}
+    for part in (header or "").split(","):
+        name, _, dur = part.strip().partition(";dur=")
+        if name and dur:
+            timings[name] = float(dur)
+    return timings
+
+
+async def drive(call, requests: int, concurrency: int):
+    """
+    Run `call(i)` for i in range(requests) with `concurrency` workers.
+    `call` returns (ok, {stage: ms}).
+    """
+    latencies, stages, errors = [], {}, 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            began = time.perf_counter()
+            try:
+                ok, timings = await call(i)
+            except Exception:
+                ok, timings = False, {}
+            latencies.append((time.perf_counter() - began) * 1000)
+            errors += not ok
+            for name, ms in timings.items():
+                stages.setdefault(name, []).append(ms)
+
+    began = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - began
+
+    def summary(values):
+        return {"p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99)}
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": requests / elapsed if elapsed else 0.0,
+        "latency_ms": summary(latencies),
+        "stages_ms": {name: summary(values) for name, values in stages.items()}
+    }
+
+
+def build_targets(client, corpus):
+    from fastapi.concurrency import run_in_threadpool
+    from modules.normalize_module import normalize_date_phrase
+    from modules.availability_module import SLOT_MINUTES
+    from .stubs import make_image
+
+    texts = [e["input"] for e in corpus.get("text", [])]
+    images = [make_image(text) for text in texts]
+    phrases = corpus.get("normalize", [])
+    departments = corpus.get("schedule", [])
+    scheduled = iter(range(10 ** 9))
+
+    async def text(i):
+        r = await client.post("/pipeline/text", json={"input_text": texts[i % len(texts)]})
+        return r.status_code < 400, parse_server_timing(r.headers.get("server-timing"))
+
+    async def image(i):
+        files = {"file": ("bench.png", images[i % len(images)], "image/png")}
+        r = await client.post("/pipeline/image", files=files)
+        return r.status_code < 400, parse_server_timing(r.headers.get("server-timing"))
+
+    async def schedule(i):
+        # A fresh slot per request so nothing conflicts
+        entry = departments[i % len(departments)]
+        at = SCHEDULE_START + timedelta(minutes=next(scheduled) * SLOT_MINUTES)
+        appointment = {"department": entry["department"], "date": at.strftime("%Y-%m-%d"),
+                       "time": at.strftime("%H:%M"), "tz": entry.get("tz", "Asia/Kolkata")}
+        began = time.perf_counter()
+        r = await client.post("/scheduler/schedule", json={"appointment": appointment})
+        return r.status_code < 400, {"schedule": (time.perf_counter() - began) * 1000}
+
+    async def normalize(i):
+        entry = phrases[i % len(phrases)]
+        began = time.perf_counter()
+        await run_in_threadpool(normalize_date_phrase, entry["date_phrase"], entry["time_phrase"])
+        return True, {"normalize": (time.perf_counter() - began) * 1000}
+
+    return {"text": text, "image": image, "schedule": schedule, "normalize": normalize}
+
+
+def print_result(target: str, result: dict):
+    lat = result["latency_ms"]
+    print(f"{target:<10}{result['concurrency']:>6}{result['requests']:>7}{result['errors']:>6}"
+          f"{result['rps']:>10.1f}{lat['p50']:>10.1f}{lat['p95']:>10.1f}{lat['p99']:>10.1f}")
+    for name, s in result["stages_ms"].items():
+        print(f"  {name:<29}{'':>10}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['p99']:>10.1f}")
+
+async def run(args):
+    import httpx
+    import main, resources
+    from cache import TTLCache
+    from .stubs import StubLLM, install_ocr_stub
+
+    llm = StubLLM(latency=args.llm_latency, jitter=args.llm_jitter)
+    resources.set_llm(llm)
+    install_ocr_stub(args.ocr_latency)
+    if not args.cache:
+        for cache in TTLCache.instances:
+            cache.max_entries, cache.redis_url = 0, None
+    await main.warmup(["db"])
+
+    corpus = load_corpus(args.corpus)
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+    names = [t for t in args.targets.split(",") if t]
+    unknown = [t for t in names if t not in TARGETS]
+    if unknown:
+        sys.exit(f"Unknown targets: {unknown}")
+
+    results = []
+    print(f"{'target':<10}{'conc':>6}{'reqs':>7}{'err':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        targets = build_targets(client, corpus)
+        for name in names:
+            for concurrency in levels:
+                result = await drive(targets[name], args.requests, concurrency)
+                print_result(name, result)
+                results.append({"target": name, **result})
+
+    import metrics
+    tokens = {kind: sum(v for (_, k), v in metrics.llm_tokens._values.items() if k == kind)
+              for kind in ("prompt", "completion")}
+    print(f"stub LLM calls: {llm.calls}, tokens: {tokens['prompt']} prompt / {tokens['completion']} completion")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return results
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Must be set before the app modules read their config
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    os.environ.setdefault("WARMUP_ON_STARTUP", "")
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
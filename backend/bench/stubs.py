@@ -0,0 +1,135 @@
+import asyncio, hashlib, io, json, random, time
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Markers that identify each chain's prompt
+OCR_CLEANUP_MARKER = "Input: "
+ENTITIES_MARKER = "Input JSON:\n"
+FINAL_MARKER = "Input JSON from normalization step:\n"
+MERGED_MARKER = "Request: "
+
+# Used when the input is too messy for the rule-based extractor
+DEFAULT_ENTITIES = {"date_phrase": "tomorrow", "time_phrase": "10am", "department": "general medicine"}
+
+
+def _after(prompt: str, marker: str) -> str:
+    return prompt.split(marker, 1)[1].split("\n", 1)[0]
+
+
+class StubLLM(BaseChatModel):
+    """
+    Deterministic offline stand-in for the Gemini chat model. Answers each
+    chain's prompt with well-formed JSON after `latency` (+/- `jitter`)
+    seconds, and reports word counts as token usage.
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    seed: int = 0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "bench-stub"
+
+    def _delay(self, prompt: str) -> float:
+        if not self.jitter:
+            return self.latency
+        rng = random.Random(f"{self.seed}:{prompt}")
+        return max(self.latency + rng.uniform(-self.jitter, self.jitter), 0.0)
+
+    def _answer(self, prompt: str) -> str:
+        from modules.fastpath_module import fast_extract
+
+        if FINAL_MARKER in prompt:
+            appointment = json.loads(_after(prompt, FINAL_MARKER))
+            return json.dumps({"appointment": appointment, "status": "ok"})
+        if ENTITIES_MARKER in prompt:
+            raw_text = json.loads(_after(prompt, ENTITIES_MARKER)).get("raw_text", "")
+            found = fast_extract(raw_text)["entities"]
+            entities = {k: found.get(k) or v for k, v in DEFAULT_ENTITIES.items()}
+            return "```json\n" + json.dumps({"entities": entities, "entities_confidence": 0.9}) + "\n```"
+        if MERGED_MARKER in prompt:
+            found = fast_extract(_after(prompt, MERGED_MARKER))
+            entities = {k: found["entities"].get(k) or v for k, v in DEFAULT_ENTITIES.items()}
+            return json.dumps({"raw_text": found["raw_text"], **entities, "confidence": 0.9})
+        text = _after(prompt, OCR_CLEANUP_MARKER) if OCR_CLEANUP_MARKER in prompt else ""
+        return json.dumps({"raw_text": text.strip(), "confidence": 0.9})
+
+    def _result(self, messages) -> ChatResult:
+        self.calls += 1
+        prompt = messages[-1].content
+        text = self._answer(prompt)
+        usage = {
+            "input_tokens": len(prompt.split()),
+            "output_tokens": len(text.split()),
+            "total_tokens": len(prompt.split()) + len(text.split())
+        }
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    def with_structured_output(self, schema, method=None, *, include_raw: bool = False, **kwargs):
+        """
+        Same result shape as the real model's structured output.
+        """
+        from langchain_core.output_parsers import PydanticOutputParser
+        from langchain_core.runnables import RunnableLambda
+
+        parser = PydanticOutputParser(pydantic_object=schema)
+
+        def parse(message):
+            if not include_raw:
+                return parser.invoke(message)
+            try:
+                return {"raw": message, "parsed": parser.invoke(message), "parsing_error": None}
+            except Exception as e:
+                return {"raw": message, "parsed": None, "parsing_error": e}
+
+        return self | RunnableLambda(parse)
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay(messages[-1].content))
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay(messages[-1].content))
+        return self._result(messages)
+
+
+# ----------------- OCR -----------------
+TEXT_KEY = "bench_text"
+
+def make_image(text: str) -> bytes:
+    """
+    PNG with `text` drawn on it and stored in a tEXt chunk for the OCR stub.
+    """
+    from PIL import Image, ImageDraw
+    from PIL.PngImagePlugin import PngInfo
+
+    image = Image.new("L", (8 * len(text) + 20, 40), 255)
+    ImageDraw.Draw(image).text((10, 12), text, fill=0)
+    info = PngInfo()
+    info.add_text(TEXT_KEY, text)
+    buf = io.BytesIO()
+    image.save(buf, "PNG", pnginfo=info)
+    return buf.getvalue()
+
+def install_ocr_stub(latency: float = 0.0):
+    """
+    Replace ocr_pool.recognize with an in-memory lookup of the text
+    embedded by make_image(), so no EasyOCR model is loaded.
+    """
+    import ocr_pool
+    from PIL import Image
+
+    texts = {}
+
+    async def recognize(image_bytes: bytes) -> str:
+        digest = hashlib.sha256(image_bytes).digest()
+        if digest not in texts:
+            texts[digest] = Image.open(io.BytesIO(image_bytes)).text.get(TEXT_KEY) or ocr_pool.NO_TEXT_FOUND
+        await asyncio.sleep(latency)
+        return texts[digest]
+
+    ocr_pool.recognize = recognize
+    return recognize
@@ -0,0 +1,196 @@
+import asyncio, hashlib, json, os, re, time
+from collections import OrderedDict
+from threading import Lock
+
+# Shared tier is optional; leave CACHE_REDIS_URL unset for in-process only
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "86400"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# Seconds to skip the Redis tier after it errors, so an outage costs one timeout
+CACHE_REDIS_BACKOFF = float(os.getenv("CACHE_REDIS_BACKOFF", "30"))
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip().casefold()
+
+class TTLCache:
+    """
+    In-process LRU with per-entry TTL, backed by an optional Redis tier.
+    Values must be JSON serializable. Redis errors are treated as misses.
+    Async code uses aget/aset/adelete so Redis round-trips never block the loop.
+    """
+    instances = []
+
+    def __init__(self, namespace: str, ttl: int = CACHE_TTL_SECONDS,
+                 max_entries: int = CACHE_MAX_ENTRIES, redis_url: str = CACHE_REDIS_URL):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.redis_url = redis_url
+        self._redis = None
+        self._aredis = None
+        self._redis_down_until = 0.0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        TTLCache.instances.append(self)
+
+    def make_key(self, *parts) -> str:
+        raw = "\x1f".join(str(p) for p in parts)
+        return f"{self.namespace}:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+    def _redis_available(self) -> bool:
+        return bool(self.redis_url) and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, e: Exception):
+        if time.monotonic() >= self._redis_down_until:
+            print(f"[Cache] Redis tier for {self.namespace} unavailable ({e}); "
+                  f"skipping it for {CACHE_REDIS_BACKOFF:g}s")
+        self._redis_down_until = time.monotonic() + CACHE_REDIS_BACKOFF
+
+    def _client(self):
+        if not self._redis_available():
+            return None
+        if self._redis is None:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(
+                    self.redis_url, socket_timeout=0.1, socket_connect_timeout=0.1
+                )
+            except Exception:
+                self.redis_url = None
+        return self._redis
+
+    def _aclient(self):
+        if not self._redis_available():
+            return None
+        # redis.asyncio connections belong to the loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._aredis is None or self._aredis[0] is not loop:
+            try:
+                import redis.asyncio
+                self._aredis = (loop, redis.asyncio.Redis.from_url(
+                    self.redis_url, socket_timeout=0.1, socket_connect_timeout=0.1
+                ))
+            except Exception:
+                self.redis_url = None
+                return None
+        return self._aredis[1]
+
+    def _set_local(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_local(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+        return None
+
+    def _redis_hit(self, key, raw):
+        if raw is None:
+            self.misses += 1
+            return None
+        value = json.loads(raw)
+        self._set_local(key, value)
+        self.redis_hits += 1
+        return value
+
+    def _delete_local(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def get(self, key):
+        value = self._get_local(key)
+        if value is not None:
+            return value
+        raw = None
+        client = self._client()
+        if client is not None:
+            try:
+                raw = client.get(key)
+            except Exception as e:
+                self._redis_failed(e)
+        return self._redis_hit(key, raw)
+
+    def set(self, key, value, ttl: int = None):
+        """
+        `ttl` overrides the cache default for this entry.
+        """
+        self._set_local(key, value, ttl)
+        client = self._client()
+        if client is not None:
+            try:
+                client.set(key, json.dumps(value), ex=ttl or self.ttl)
+            except Exception as e:
+                self._redis_failed(e)
+
+    def delete(self, *keys):
+        self._delete_local(keys)
+        client = self._client()
+        if client is not None and keys:
+            try:
+                client.delete(*keys)
+            except Exception as e:
+                self._redis_failed(e)
+
+    async def aget(self, key):
+        value = self._get_local(key)
+        if value is not None:
+            return value
+        raw = None
+        client = self._aclient()
+        if client is not None:
+            try:
+                raw = await client.get(key)
+            except Exception as e:
+                self._redis_failed(e)
+        return self._redis_hit(key, raw)
+
+    async def aset(self, key, value, ttl: int = None):
+        self._set_local(key, value, ttl)
+        client = self._aclient()
+        if client is not None:
+            try:
+                await client.set(key, json.dumps(value), ex=ttl or self.ttl)
+            except Exception as e:
+                self._redis_failed(e)
+
+    async def adelete(self, *keys):
+        self._delete_local(keys)
+        client = self._aclient()
+        if client is not None and keys:
+            try:
+                await client.delete(*keys)
+            except Exception as e:
+                self._redis_failed(e)
+
+    def stats(self):
+        return {
+            "namespace": self.namespace,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses
+        }
+
+# Results of the OCR cleanup and entity extraction chains
+stage_cache = TTLCache("stage")
+
+# EasyOCR text keyed by image content hash
+ocr_cache = TTLCache("ocr")
+
+# GET /appointments/{task_id} responses keyed by task_id; crud invalidates on write
+APPOINTMENT_CACHE_TTL = int(os.getenv("APPOINTMENT_CACHE_TTL", "60"))
+appointment_cache = TTLCache("appointment", ttl=APPOINTMENT_CACHE_TTL)
@@ -1,16 +1,114 @@
+from dotenv import load_dotenv
+
+# Workers and beat don't import main; read backend/.env before the db modules do
+load_dotenv()
+
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from datetime import datetime
+import os
 import pytz
+from database.database import SessionLocal
+from database import crud
+from database.status_writer import status_writer
+from notifications import get_sink
+import metrics
+
+DISPATCH_INTERVAL_SECONDS = float(os.getenv("DISPATCH_INTERVAL_SECONDS", "5"))
+REMINDER_MAX_RETRIES = int(os.getenv("REMINDER_MAX_RETRIES", "5"))
+# Task results are only useful for a short while; don't keep one per appointment forever
+CELERY_RESULT_EXPIRES = int(os.getenv("CELERY_RESULT_EXPIRES", "3600"))
+# OCR/LLM pipeline jobs run on their own worker pool
+PIPELINE_QUEUE = os.getenv("PIPELINE_QUEUE", "pipeline")
 
 celery = Celery(
     "scheduler",
     broker="redis://redis:6379/0",
-    backend="redis://redis:6379/0"
+    backend="redis://redis:6379/0",
+    include=["dispatcher", "pipeline_tasks"]
 )
 
-@celery.task(name="run_appointment")
-def run_appointment(appointment: dict):
+celery.conf.result_expires = CELERY_RESULT_EXPIRES
+celery.conf.task_routes = {"run_pipeline_job": {"queue": PIPELINE_QUEUE}}
+
+# Appointments are enqueued by the dispatcher shortly before they are due,
+# instead of as far-future ETA tasks held in worker memory
+celery.conf.beat_schedule = {
+    "dispatch-due-appointments": {
+        "task": "dispatch_due_appointments",
+        "schedule": DISPATCH_INTERVAL_SECONDS,
+        "options": {"expires": DISPATCH_INTERVAL_SECONDS},
+    },
+}
+
+@celery.task(name="run_appointment", bind=True)
+def run_appointment(self, appointment: dict):
     tz = pytz.timezone("Asia/Kolkata")
     now = datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S %Z")
+
+    # Deliveries are at-least-once; only the first one claims the row
+    db = SessionLocal()
+    try:
+        claimed = crud.claim_appointments(db, [self.request.id])
+    finally:
+        db.close()
+    if not claimed:
+        return {"status": "skipped", "appointment": appointment}
+
     print(f"[Scheduler] 🔔 Appointment triggered at {now}: {appointment}")
+    status_writer.report(self.request.id, "done")
     return {"status": "done", "appointment": appointment, "executed_at": now}
+
+@celery.task(name="deliver_reminder_batch", bind=True, max_retries=REMINDER_MAX_RETRIES,
+             acks_late=True, reject_on_worker_lost=True)
+def deliver_reminder_batch(self, appointments: list, claimed: bool = False):
+    """
+    Deliver reminders for every appointment in one time bucket. The rows
+    are claimed once; retries resend only what this batch claimed. The
+    message is acked after delivery. Rows a dead worker claimed but never
+    delivered stay "triggered" and are re-dispatched once stale.
+    """
+    if self.request.eta and not self.request.retries:
+        eta = datetime.fromisoformat(self.request.eta)
+        metrics.reminder_lag_seconds.observe(max((datetime.now(eta.tzinfo) - eta).total_seconds(), 0))
+
+    db = SessionLocal()
+    try:
+        if not claimed:
+            claimed_ids = set(crud.claim_appointments(db, [a["task_id"] for a in appointments]))
+            appointments = [a for a in appointments if a["task_id"] in claimed_ids]
+            if not appointments:
+                return {"delivered": 0, "failed": 0}
+
+        try:
+            results = get_sink().send(appointments)
+        except Exception as e:
+            if self.request.retries >= self.max_retries:
+                status_writer.report_many({a["task_id"]: "failed" for a in appointments})
+                raise
+            # args must be replaced too, or the original payload is passed again
+            raise self.retry(
+                exc=e,
+                countdown=min(2 ** self.request.retries, 60),
+                args=[appointments],
+                kwargs={"claimed": True}
+            )
+
+        statuses = {a["task_id"]: "done" if results.get(a["task_id"]) else "failed" for a in appointments}
+        status_writer.report_many(statuses)
+    finally:
+        db.close()
+
+    delivered = sum(1 for status in statuses.values() if status == "done")
+    return {"delivered": delivered, "failed": len(statuses) - delivered}
+
+@worker_process_init.connect
+def serve_worker_metrics(**kwargs):
+    # Each prefork child serves its own registry on the next port up
+    if metrics.WORKER_METRICS_PORT:
+        from billiard.process import current_process
+        metrics.serve(metrics.WORKER_METRICS_PORT + (getattr(current_process(), "index", 0) or 0))
+
+@worker_process_shutdown.connect
+def flush_status_writer(**kwargs):
+    status_writer.flush()
@@ -1,5 +1,12 @@
+from sqlalchemy import insert, update, select, tuple_, literal, or_, and_, case, text, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from datetime import datetime, timezone
 from .models import AppointmentDB
+from cache import appointment_cache
+
+def invalidate_appointments(task_ids):
+    appointment_cache.delete(*[appointment_cache.make_key(task_id) for task_id in task_ids])
 
 def create_appointment(db: Session, task_id: str, appointment: dict, scheduled_for):
     new_task = AppointmentDB(
@@ -8,23 +15,220 @@ def create_appointment(db: Session, task_id: str, appointment: dict, scheduled_f
         date=appointment["date"],
         time=appointment["time"],
         tz=appointment.get("tz", "Asia/Kolkata"),
-        status="scheduled"
+        status="scheduled",
+        scheduled_at=scheduled_for
     )
     db.add(new_task)
     db.commit()
     db.refresh(new_task)
+    invalidate_appointments([task_id])
     return new_task
 
+def create_appointments_bulk(db: Session, task_ids, appointments, scheduled_for):
+    """
+    Multi-row insert without committing, so the caller controls the transaction.
+    """
+    rows = [
+        {
+            "task_id": task_id,
+            "department": appointment["department"],
+            "date": appointment["date"],
+            "time": appointment["time"],
+            "tz": appointment.get("tz", "Asia/Kolkata"),
+            "status": "scheduled",
+            "scheduled_at": run_at
+        }
+        for task_id, appointment, run_at in zip(task_ids, appointments, scheduled_for)
+    ]
+    if rows:
+        db.execute(insert(AppointmentDB), rows)
+    return len(rows)
+
+def lock_departments(db: Session, departments):
+    """
+    Serialize bookings per department until the transaction ends, so two
+    workers cannot both see a slot as free. Postgres only; SQLite already
+    serializes writers.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for department in sorted(set(departments)):
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+                   {"key": f"appointments:{department}"})
+
+def active_bookings(db: Session, departments, start, end, inactive_statuses):
+    """
+    (department, scheduled_at, tz) of rows holding a slot in [start, end).
+    `departments` are stripped, casefolded names.
+    """
+    return db.execute(
+        select(AppointmentDB.department, AppointmentDB.scheduled_at, AppointmentDB.tz)
+        .where(func.lower(func.trim(AppointmentDB.department)).in_(list(set(departments))))
+        .where(AppointmentDB.scheduled_at >= start)
+        .where(AppointmentDB.scheduled_at < end)
+        .where(AppointmentDB.status.notin_(inactive_statuses))
+    ).all()
+
+def cancel_appointment(db: Session, task_id: str, holding_statuses) -> bool:
+    """
+    Mark the row cancelled if it is in one of `holding_statuses`; rows
+    in any other status keep it. Returns True if the row was cancelled,
+    i.e. its slot should be released. The check and the update are one
+    statement, so concurrent cancels release once.
+    """
+    held = db.execute(
+        update(AppointmentDB)
+        .where(AppointmentDB.task_id == task_id)
+        .where(AppointmentDB.status.in_(holding_statuses))
+        .values(status="cancelled")
+    ).rowcount
+    db.commit()
+    invalidate_appointments([task_id])
+    return bool(held)
+
 def update_status(db: Session, task_id: str, status: str):
     task = db.query(AppointmentDB).filter(AppointmentDB.task_id == task_id).first()
     if task:
         task.status = status
         db.commit()
         db.refresh(task)
+    invalidate_appointments([task_id])
     return task
 
+def lock_due_appointments(db: Session, due_after, due_before, stale_before, limit: int):
+    """
+    Rows due between `due_after` and `due_before` that are still waiting to
+    be enqueued, plus rows enqueued or claimed before `stale_before` that
+    never finished (the worker died before delivering).
+    Locked FOR UPDATE SKIP LOCKED so concurrent dispatchers never pick the
+    same row.
+    """
+    return (
+        db.query(AppointmentDB)
+        .filter(AppointmentDB.scheduled_at >= due_after)
+        .filter(AppointmentDB.scheduled_at <= due_before)
+        .filter(or_(
+            AppointmentDB.status == "scheduled",
+            and_(AppointmentDB.status == "queued", AppointmentDB.queued_at < stale_before),
+            and_(AppointmentDB.status == "triggered", or_(
+                AppointmentDB.triggered_at < stale_before, AppointmentDB.triggered_at.is_(None)
+            ))
+        ))
+        .order_by(AppointmentDB.scheduled_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+def expire_overdue(db: Session, due_before) -> int:
+    """
+    Mark rows due before `due_before` that were never delivered as expired.
+    """
+    expired = db.execute(
+        update(AppointmentDB)
+        .where(AppointmentDB.scheduled_at < due_before)
+        .where(AppointmentDB.status.in_(("scheduled", "queued", "triggered")))
+        .values(status="expired")
+        .returning(AppointmentDB.task_id)
+    ).scalars().all()
+    db.commit()
+    invalidate_appointments(expired)
+    return len(expired)
+
+def mark_queued(db: Session, ids, queued_at):
+    db.execute(
+        update(AppointmentDB)
+        .where(AppointmentDB.id.in_(ids))
+        .values(status="queued", queued_at=queued_at)
+    )
+
+def claim_appointments(db: Session, task_ids):
+    """
+    Atomically move rows to "triggered" and return the task ids that were
+    still pending. Duplicate deliveries of a task claim nothing.
+    """
+    result = db.execute(
+        update(AppointmentDB)
+        .where(AppointmentDB.task_id.in_(task_ids))
+        .where(AppointmentDB.status.in_(("scheduled", "queued")))
+        .values(status="triggered", triggered_at=datetime.now(timezone.utc))
+        .returning(AppointmentDB.task_id)
+    )
+    claimed = [row[0] for row in result]
+    db.commit()
+    return claimed
+
+def set_statuses(db: Session, statuses: dict):
+    """
+    One UPDATE for many rows: {task_id: status}.
+    """
+    if not statuses:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        values, params = [], {}
+        for i, (task_id, status) in enumerate(statuses.items()):
+            values.append(f"(:t{i}, :s{i})")
+            params[f"t{i}"], params[f"s{i}"] = task_id, status
+        db.execute(text(
+            "UPDATE appointments AS a SET status = v.status "
+            f"FROM (VALUES {', '.join(values)}) AS v(task_id, status) "
+            "WHERE a.task_id = v.task_id"
+        ), params)
+    else:
+        db.execute(
+            update(AppointmentDB)
+            .where(AppointmentDB.task_id.in_(list(statuses)))
+            .values(status=case(statuses, value=AppointmentDB.task_id))
+        )
+    db.commit()
+    invalidate_appointments(statuses)
+
 def get_all_appointments(db: Session):
     return db.query(AppointmentDB).all()
 
+def appointments_page_query(limit: int, after=None, start=None, end=None,
+                            department: str = None, status: str = None):
+    """
+    Keyset page ordered by (scheduled_at, id). `after` is the
+    (scheduled_at, id) of the last row of the previous page.
+    """
+    query = select(AppointmentDB).where(AppointmentDB.scheduled_at.isnot(None))
+    if department:
+        query = query.where(AppointmentDB.department == department)
+    if status:
+        query = query.where(AppointmentDB.status == status)
+    if start:
+        query = query.where(AppointmentDB.scheduled_at >= start)
+    if end:
+        query = query.where(AppointmentDB.scheduled_at < end)
+    if after:
+        after_at, after_id = after
+        query = query.where(
+            tuple_(AppointmentDB.scheduled_at, AppointmentDB.id)
+            > tuple_(literal(after_at, AppointmentDB.scheduled_at.type), literal(after_id))
+        )
+    return query.order_by(AppointmentDB.scheduled_at, AppointmentDB.id).limit(limit)
+
+def list_appointments(db: Session, limit: int, **filters):
+    return db.scalars(appointments_page_query(limit, **filters)).all()
+
+async def alist_appointments(db: AsyncSession, limit: int, **filters):
+    return (await db.scalars(appointments_page_query(limit, **filters))).all()
+
 def get_appointment(db: Session, task_id: str):
     return db.query(AppointmentDB).filter(AppointmentDB.task_id == task_id).first()
+
+async def aget_appointment(db: AsyncSession, task_id: str):
+    return await db.scalar(select(AppointmentDB).where(AppointmentDB.task_id == task_id))
+
+def to_dict(task: AppointmentDB):
+    return {
+        "id": task.id,
+        "task_id": task.task_id,
+        "department": task.department,
+        "date": task.date,
+        "time": task.time,
+        "tz": task.tz,
+        "status": task.status,
+        "scheduled_at": task.scheduled_at.isoformat() if task.scheduled_at else None
+    }
@@ -0,0 +1,34 @@
+from sqlalchemy import text
+
+# Idempotent schema changes for tables created before the column/index
+# existed. create_all() handles fresh databases on its own.
+POSTGRES_MIGRATIONS = [
+    "ALTER TABLE appointments ADD COLUMN IF NOT EXISTS scheduled_at TIMESTAMPTZ",
+    # Rows from before the column existed were never marked delivered;
+    # the ones already in the past must not get a reminder now
+    """
+    UPDATE appointments
+    SET scheduled_at = v.scheduled_at,
+        status = CASE WHEN status = 'scheduled' AND v.scheduled_at < now() THEN 'expired' ELSE status END
+    FROM (
+        SELECT id, (date || ' ' || time)::timestamp AT TIME ZONE COALESCE(tz, 'Asia/Kolkata') AS scheduled_at
+        FROM appointments
+        WHERE scheduled_at IS NULL
+    ) AS v
+    WHERE appointments.id = v.id
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_appointments_department_scheduled_at ON appointments (department, scheduled_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_status_scheduled_at ON appointments (status, scheduled_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_scheduled_at_id ON appointments (scheduled_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_department_key_scheduled_at "
+    "ON appointments (lower(trim(department)), scheduled_at)",
+    "ALTER TABLE appointments ADD COLUMN IF NOT EXISTS queued_at TIMESTAMPTZ",
+    "ALTER TABLE appointments ADD COLUMN IF NOT EXISTS triggered_at TIMESTAMPTZ",
+]
+
+def run_migrations(engine):
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for statement in POSTGRES_MIGRATIONS:
+            conn.execute(text(statement))
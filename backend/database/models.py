@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index, func
 from datetime import datetime
 from .database import Base
 
@@ -12,4 +12,18 @@ class AppointmentDB(Base):
     time = Column(String, nullable=False)   
     tz = Column(String, default="Asia/Kolkata")
     status = Column(String, default="scheduled")  
-    
+    scheduled_at = Column(DateTime(timezone=True))  # date + time localized to tz
+    queued_at = Column(DateTime(timezone=True))  # last hand-off to the broker
+    triggered_at = Column(DateTime(timezone=True))  # last claim by a reminder worker
+
+    # id breaks ties so (scheduled_at, id) keyset pagination is index-only
+    __table_args__ = (
+        Index("ix_appointments_department_scheduled_at", "department", "scheduled_at", "id"),
+        Index("ix_appointments_status_scheduled_at", "status", "scheduled_at", "id"),
+        # Unfiltered and start/end-only pages
+        Index("ix_appointments_scheduled_at_id", "scheduled_at", "id"),
+    )
+
+# Slot capacity checks match departments the way the availability index does
+Index("ix_appointments_department_key_scheduled_at",
+      func.lower(func.trim(AppointmentDB.department)), AppointmentDB.scheduled_at)
@@ -0,0 +1,79 @@
+import atexit, os, time
+from threading import Lock, Thread
+from .database import SessionLocal
+from . import crud
+
+# Flush when this many transitions are buffered or the oldest is this old
+STATUS_FLUSH_SIZE = int(os.getenv("STATUS_FLUSH_SIZE", "500"))
+STATUS_FLUSH_SECONDS = float(os.getenv("STATUS_FLUSH_SECONDS", "2"))
+
+
+class StatusWriter:
+    """
+    Buffers appointment status transitions and writes them with one bulk
+    UPDATE per flush. Later reports for the same task_id overwrite earlier
+    ones. The flush thread starts on first use, so it is created inside
+    each forked worker process rather than in the parent.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_batch: int = STATUS_FLUSH_SIZE,
+                 max_delay: float = STATUS_FLUSH_SECONDS):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = {}
+        self._oldest = None
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._thread = None
+
+    def report(self, task_id: str, status: str):
+        self.report_many({task_id: status})
+
+    def report_many(self, statuses: dict):
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.update(statuses)
+            full = len(self._pending) >= self.max_batch
+        self._ensure_thread()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                statuses, self._pending = self._pending, {}
+                self._oldest = None
+            if not statuses:
+                return 0
+            db = self.session_factory()
+            try:
+                crud.set_statuses(db, statuses)
+            except Exception as e:
+                db.rollback()
+                # Put them back unless newer reports arrived meanwhile
+                with self._lock:
+                    self._pending = {**statuses, **self._pending}
+                    self._oldest = self._oldest or time.monotonic()
+                print(f"[StatusWriter] flush of {len(statuses)} statuses failed: {e}")
+                return 0
+            finally:
+                db.close()
+            return len(statuses)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(target=self._run, name="status-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.max_delay / 2)
+            oldest = self._oldest
+            if oldest is not None and time.monotonic() - oldest >= self.max_delay:
+                self.flush()
+
+
+status_writer = StatusWriter()
+atexit.register(status_writer.flush)
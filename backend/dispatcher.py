@@ -0,0 +1,86 @@
+import os
+from datetime import datetime, timedelta
+import pytz
+from celery_app import celery, deliver_reminder_batch
+from database.database import SessionLocal
+from database import crud
+import metrics
+
+# How far ahead appointments are handed to the broker; keep it above the
+# beat interval and well below the broker visibility timeout
+DISPATCH_HORIZON_SECONDS = int(os.getenv("DISPATCH_HORIZON_SECONDS", "60"))
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", "1000"))
+# Queued rows not picked up, or claimed rows not delivered (worker died),
+# this long after the hand-off are re-enqueued
+DISPATCH_REQUEUE_AFTER_SECONDS = int(os.getenv("DISPATCH_REQUEUE_AFTER_SECONDS", "300"))
+# Rows still pending this long after they were due (old imports, long
+# outages) are marked expired instead of sending a late reminder
+DISPATCH_GRACE_SECONDS = int(os.getenv("DISPATCH_GRACE_SECONDS", "3600"))
+# Appointments due in the same bucket are delivered by one task
+REMINDER_BUCKET_SECONDS = int(os.getenv("REMINDER_BUCKET_SECONDS", "60"))
+REMINDER_BATCH_MAX = int(os.getenv("REMINDER_BATCH_MAX", "500"))
+
+def appointment_payload(row):
+    return {"task_id": row.task_id, "department": row.department, "date": row.date, "time": row.time, "tz": row.tz}
+
+def bucket_rows(rows, now):
+    """
+    Group rows into (eta, [payload, ...]) by due-time bucket, split at
+    REMINDER_BATCH_MAX.
+    """
+    buckets = {}
+    for row in rows:
+        scheduled_at = row.scheduled_at
+        if scheduled_at.tzinfo is None:
+            scheduled_at = pytz.utc.localize(scheduled_at)
+        bucket = int(scheduled_at.timestamp()) // REMINDER_BUCKET_SECONDS
+        buckets.setdefault(bucket, []).append(appointment_payload(row))
+
+    for bucket, payloads in sorted(buckets.items()):
+        eta = max(datetime.fromtimestamp(bucket * REMINDER_BUCKET_SECONDS, pytz.utc), now)
+        for i in range(0, len(payloads), REMINDER_BATCH_MAX):
+            yield eta, payloads[i:i + REMINDER_BATCH_MAX]
+
+@celery.task(name="dispatch_due_appointments", ignore_result=True)
+def dispatch_due_appointments():
+    """
+    Sweep the appointments table and enqueue rows due within the horizon as
+    one reminder batch per time bucket. Messages are published before the
+    rows are marked queued, so a crash can only cause a re-publish, which
+    the batch's claim de-duplicates; the row locks make a worker's claim
+    wait until the queued mark commits.
+    """
+    now = datetime.now(pytz.utc)
+    due_before = now + timedelta(seconds=DISPATCH_HORIZON_SECONDS)
+    stale_before = now - timedelta(seconds=DISPATCH_REQUEUE_AFTER_SECONDS)
+    expired_before = now - timedelta(seconds=DISPATCH_GRACE_SECONDS)
+    dispatched = 0
+
+    db = SessionLocal()
+    try:
+        expired = crud.expire_overdue(db, expired_before)
+        if expired:
+            print(f"[Dispatcher] Marked {expired} overdue appointments expired")
+        while True:
+            rows = crud.lock_due_appointments(db, expired_before, due_before, stale_before, DISPATCH_BATCH_SIZE)
+            if not rows:
+                break
+
+            with metrics.celery_publish_seconds.time(), celery.producer_or_acquire() as producer:
+                for eta, payloads in bucket_rows(rows, now):
+                    deliver_reminder_batch.apply_async(args=[payloads], eta=eta, producer=producer)
+            crud.mark_queued(db, [row.id for row in rows], now)
+            db.commit()
+
+            dispatched += len(rows)
+            if len(rows) < DISPATCH_BATCH_SIZE:
+                break
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if dispatched:
+        print(f"[Dispatcher] Enqueued {dispatched} due appointments")
+    return {"dispatched": dispatched}
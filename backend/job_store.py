@@ -0,0 +1,53 @@
+import os
+
+# Uploaded images for queued pipeline jobs are passed to workers by
+# reference: a Redis key, or a file on a volume shared with the workers
+# when JOB_IMAGE_DIR is set.
+JOB_REDIS_URL = os.getenv("JOB_REDIS_URL", "redis://redis:6379/1")
+JOB_IMAGE_DIR = os.getenv("JOB_IMAGE_DIR")
+JOB_IMAGE_TTL = int(os.getenv("JOB_IMAGE_TTL", "3600"))
+
+_redis = None
+
+def _client():
+    global _redis
+    if _redis is None:
+        import redis
+        _redis = redis.Redis.from_url(JOB_REDIS_URL)
+    return _redis
+
+def put_image(job_id: str, image_bytes: bytes) -> str:
+    if JOB_IMAGE_DIR:
+        path = os.path.join(JOB_IMAGE_DIR, f"{job_id}.img")
+        with open(path, "wb") as f:
+            f.write(image_bytes)
+        return f"file:{path}"
+    key = f"job:image:{job_id}"
+    _client().set(key, image_bytes, ex=JOB_IMAGE_TTL)
+    return f"redis:{key}"
+
+def get_image(ref: str) -> bytes:
+    """
+    Raises KeyError if the image expired or was already consumed.
+    """
+    scheme, _, location = ref.partition(":")
+    if scheme == "file":
+        try:
+            with open(location, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(ref)
+    data = _client().get(location)
+    if data is None:
+        raise KeyError(ref)
+    return data
+
+def delete_image(ref: str):
+    scheme, _, location = ref.partition(":")
+    if scheme == "file":
+        try:
+            os.remove(location)
+        except FileNotFoundError:
+            pass
+    else:
+        _client().delete(location)
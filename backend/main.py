@@ -1,16 +1,16 @@
 import os
-from fastapi import FastAPI
-from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from database.database import Base, engine
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from database.database import init_db, dispose_async_engine
+from resources import warmup_llm
+import ocr_pool
+import metrics
+from resilience import LLMUnavailable
 
-
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise ValueError("Please set GOOGLE_API_KEY in .env file")
-
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
+# Resources initialized at startup; everything else loads on first use.
+# A text-only deployment should leave "ocr" out.
+WARMUP_ON_STARTUP = [r for r in os.getenv("WARMUP_ON_STARTUP", "db").split(",") if r]
 
 app = FastAPI(title="Appointment Scheduler API")
 
@@ -22,10 +22,10 @@ from modules.final_appointment_module import router as appointment_router
 from modules.text_pipeline_module import router as text_pipeline_router
 from modules.image_pipeline_module import router as image_pipeline_router
 from modules.scheduler_module import router as scheduler_router
+from modules.availability_module import router as availability_router, load_availability
+from modules.jobs_module import router as jobs_router
 
 
-Base.metadata.create_all(bind=engine)
-
 app.include_router(ocr_router, prefix="/step1", tags=["OCR/Text Extraction"])
 app.include_router(entities_router, prefix="/step2", tags=["Entity Extraction"])
 app.include_router(normalize_router, prefix="/step3", tags=["Normalization"])
@@ -33,7 +33,53 @@ app.include_router(appointment_router, prefix="/step4", tags=["Appointment"])
 app.include_router(text_pipeline_router, tags=["Text Pipeline"])
 app.include_router(image_pipeline_router,  tags=["Image Pipeline"])
 app.include_router(scheduler_router, tags=["Scheduler"])
+app.include_router(availability_router, tags=["Availability"])
+app.include_router(jobs_router, tags=["Jobs"])
+
+@app.exception_handler(LLMUnavailable)
+async def llm_unavailable_handler(request, exc: LLMUnavailable):
+    # Step endpoints have no rule-based fallback; the pipelines handle it themselves
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"LLM unavailable: {exc}"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+def warmup_db():
+    init_db()
+    load_availability()
+
+WARMUPS = {
+    "db": warmup_db,
+    "llm": warmup_llm,
+    "ocr": ocr_pool.warmup,
+}
+
+async def warmup(resources):
+    for name in resources:
+        await run_in_threadpool(WARMUPS[name])
+
+@app.on_event("startup")
+async def startup_warmup():
+    await warmup(WARMUP_ON_STARTUP)
+
+@app.on_event("shutdown")
+async def shutdown_pools():
+    ocr_pool.shutdown()
+    await dispose_async_engine()
+
+@app.post("/warmup", tags=["Ops"])
+async def warmup_endpoint(resources: str = Query("db,llm,ocr")):
+    names = [r.strip() for r in resources.split(",") if r.strip()]
+    unknown = [r for r in names if r not in WARMUPS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown resources: {unknown}")
+    await warmup(names)
+    return {"status": "ok", "warmed": names}
 
+@app.get("/metrics", tags=["Ops"], response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
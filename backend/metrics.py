@@ -0,0 +1,206 @@
+import os, time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock, Thread
+
+# Celery workers serve their own metrics when set (see celery_app)
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels, rendered in Prometheus text format.
+    """
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in list(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. observe() is a bisect and three additions.
+    """
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - began, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in list(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (bound,))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render_cache_stats():
+    from cache import TTLCache
+
+    lines = []
+    for name, field in (("cache_hits_total", "hits"), ("cache_redis_hits_total", "redis_hits"),
+                        ("cache_misses_total", "misses")):
+        lines += [f"# HELP {name} Cache lookups by outcome", f"# TYPE {name} counter"]
+        lines += [f'{name}{{cache="{c.namespace}"}} {getattr(c, field)}' for c in TTLCache.instances]
+    lines += ["# HELP cache_entries In-process cache entries", "# TYPE cache_entries gauge"]
+    lines += [f'cache_entries{{cache="{c.namespace}"}} {len(c._entries)}' for c in TTLCache.instances]
+    return lines
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    lines += render_cache_stats()
+    return "\n".join(lines) + "\n"
+
+
+# ----------------- Metrics -----------------
+stage_seconds = Histogram("pipeline_stage_seconds", "Wall time per pipeline stage", ["stage"])
+ocr_seconds = Histogram("ocr_recognize_seconds", "EasyOCR time per image, including pool wait")
+llm_seconds = Histogram("llm_request_seconds", "LLM chain call latency", ["chain"])
+llm_tokens = Counter("llm_tokens_total", "LLM tokens used", ["chain", "kind"])
+llm_failures = Counter("llm_failures_total", "LLM calls that timed out or errored", ["chain", "reason"])
+llm_queue_timeouts = Counter("llm_queue_timeouts_total",
+                             "LLM calls rejected after waiting LLM_QUEUE_TIMEOUT_SECONDS for a slot", ["chain"])
+llm_hedges = Counter("llm_hedged_requests_total", "Second requests sent for slow or failed LLM calls", ["chain"])
+llm_fallbacks = Counter("llm_fallbacks_total", "Pipeline stages served by the rule-based path because the LLM was unavailable",
+                        ["stage"])
+llm_parse_failures = Counter(
+    "llm_parse_failures_total", "LLM outputs the structured parser rejected", ["chain", "outcome"]
+)
+db_seconds = Histogram("db_query_seconds", "Database statement latency", ["operation"],
+                       buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+celery_publish_seconds = Histogram("celery_publish_seconds", "Time to publish one dispatcher sweep")
+flight_calls = Counter("singleflight_calls_total",
+                       "Calls that ran (leader) or joined an identical in-flight call (coalesced)",
+                       ["flight", "outcome"])
+admission_wait_seconds = Histogram("admission_wait_seconds", "Time queued before admission",
+                                   ["request_class"])
+admission_rejected = Counter("admission_rejected_total", "Requests shed by admission control",
+                             ["request_class", "reason"])
+reminder_lag_seconds = Histogram("reminder_delivery_lag_seconds",
+                                 "Delay between a reminder batch's ETA and its execution")
+
+
+# ----------------- Instrumentation hooks -----------------
+_token_handler_class = None
+
+def token_usage_callback(chain: str):
+    """
+    LangChain callback recording prompt/completion tokens for `chain`.
+    """
+    global _token_handler_class
+    if _token_handler_class is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class TokenUsageHandler(BaseCallbackHandler):
+            def __init__(self, chain):
+                self.chain = chain
+
+            def on_llm_end(self, response, **kwargs):
+                for generations in response.generations:
+                    for generation in generations:
+                        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                        if usage:
+                            llm_tokens.inc(usage.get("input_tokens", 0), chain=self.chain, kind="prompt")
+                            llm_tokens.inc(usage.get("output_tokens", 0), chain=self.chain, kind="completion")
+
+        _token_handler_class = TokenUsageHandler
+    return _token_handler_class(chain)
+
+def instrument_engine(engine):
+    """
+    Time every statement run on `engine` (a sync Engine or an AsyncEngine's sync_engine).
+    """
+    from sqlalchemy import event
+
+    # One slot per connection, overwritten by each statement; a statement
+    # that raises never reaches after_cursor_execute
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        began = conn.info.pop("query_started", None)
+        if began is None:
+            return
+        db_seconds.observe(time.perf_counter() - began, operation=statement.lstrip().split(" ", 1)[0].upper())
+
+def serve(port: int):
+    """
+    Expose render() on a background HTTP server, for processes without FastAPI.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,235 @@
+import os
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Optional
+import pytz
+from fastapi import APIRouter, HTTPException, Query
+
+router = APIRouter()
+
+SLOT_MINUTES = int(os.getenv("SLOT_MINUTES", "30"))
+# Appointments a department can take in one slot
+SLOT_CAPACITY = int(os.getenv("SLOT_CAPACITY", "1"))
+CLINIC_TZ = os.getenv("CLINIC_TZ", "Asia/Kolkata")
+# Suggestions are limited to opening hours; conflict checks apply at any time
+CLINIC_HOURS = os.getenv("CLINIC_HOURS", "09:00-18:00")
+AVAILABILITY_SEARCH_DAYS = int(os.getenv("AVAILABILITY_SEARCH_DAYS", "7"))
+
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+# Statuses that free the slot again
+INACTIVE_STATUSES = ("cancelled", "failed")
+# Statuses of a row that currently holds its slot (cancelling releases it)
+HOLDING_STATUSES = ("scheduled", "queued", "triggered")
+
+def _minutes(hh_mm: str) -> int:
+    h, m = map(int, hh_mm.split(":"))
+    return h * 60 + m
+
+OPEN_SLOT, CLOSE_SLOT = (_minutes(t) // SLOT_MINUTES for t in CLINIC_HOURS.split("-"))
+
+
+class AvailabilityIndex:
+    """
+    Per-department, per-day array of booking counts, one byte per slot.
+    Conflict checks and updates are O(1); suggestions scan at most
+    AVAILABILITY_SEARCH_DAYS arrays.
+    """
+
+    def __init__(self):
+        self.tz = pytz.timezone(CLINIC_TZ)
+        self._days = {}
+        self._lock = Lock()
+        self._pruned_on = None
+        self.loaded = False
+
+    def _locate(self, department: str, when: datetime):
+        local = when.astimezone(self.tz)
+        key = (department.strip().casefold(), local.date())
+        slot = (local.hour * 60 + local.minute) // SLOT_MINUTES
+        return key, slot
+
+    def _day(self, key):
+        day = self._days.get(key)
+        if day is None:
+            day = self._days[key] = bytearray(SLOTS_PER_DAY)
+        return day
+
+    def is_free(self, department: str, when: datetime) -> bool:
+        key, slot = self._locate(department, when)
+        day = self._days.get(key)
+        return day is None or day[slot] < SLOT_CAPACITY
+
+    def _prune(self):
+        # Past days can't be booked any more; drop them once a day
+        today = datetime.now(self.tz).date()
+        if self._pruned_on != today:
+            self._days = {key: day for key, day in self._days.items() if key[1] >= today}
+            self._pruned_on = today
+
+    def reserve(self, department: str, when: datetime, force: bool = False) -> bool:
+        key, slot = self._locate(department, when)
+        with self._lock:
+            self._prune()
+            day = self._day(key)
+            if day[slot] >= SLOT_CAPACITY and not force:
+                return False
+            day[slot] = min(day[slot] + 1, 255)
+            return True
+
+    def release(self, department: str, when: datetime):
+        key, slot = self._locate(department, when)
+        with self._lock:
+            day = self._days.get(key)
+            if day and day[slot]:
+                day[slot] -= 1
+
+    def set_count(self, department: str, when: datetime, count: int):
+        """
+        Overwrite one slot's count, e.g. with what the table says.
+        """
+        key, slot = self._locate(department, when)
+        with self._lock:
+            self._day(key)[slot] = min(count, 255)
+
+    def same_slot(self, a, b) -> bool:
+        """
+        Whether two (department, when) bookings fall in the same slot.
+        """
+        return self._locate(*a) == self._locate(*b)
+
+    @staticmethod
+    def aware(scheduled_at: datetime, tz: str) -> datetime:
+        # SQLite drops the offset and keeps the appointment's wall time
+        if scheduled_at.tzinfo is None:
+            return pytz.timezone(tz or "Asia/Kolkata").localize(scheduled_at)
+        return scheduled_at
+
+    def slot_start(self, when: datetime) -> datetime:
+        local = when.astimezone(self.tz)
+        minutes = (local.hour * 60 + local.minute) // SLOT_MINUTES * SLOT_MINUTES
+        return self.tz.normalize(local.replace(hour=0, minute=0, second=0, microsecond=0)
+                                 + timedelta(minutes=minutes))
+
+    def db_counts(self, db, bookings, lock: bool = False) -> dict:
+        """
+        Active rows in the table per slot of `bookings` [(department, when)].
+        With `lock`, the departments stay locked until the caller's
+        transaction ends.
+        """
+        from database import crud
+
+        departments = [department.strip().casefold() for department, _ in bookings]
+        if lock:
+            crud.lock_departments(db, departments)
+        start = min(self.slot_start(when) for _, when in bookings)
+        end = max(self.slot_start(when) for _, when in bookings) + timedelta(minutes=SLOT_MINUTES)
+        counts = {}
+        for department, scheduled_at, tz in crud.active_bookings(db, departments, start, end, INACTIVE_STATUSES):
+            key = self._locate(department, self.aware(scheduled_at, tz))
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def first_full_in_db(self, db, bookings):
+        """
+        Check `bookings` against the table inside the caller's transaction,
+        which keeps the departments locked until it ends. Returns
+        (department, when, rows in the table) for the first booking whose
+        slot is already full, counting earlier entries of `bookings` too,
+        or None.
+        """
+        if not bookings:
+            return None
+        in_db = self.db_counts(db, bookings, lock=True)
+        counts = dict(in_db)
+        for department, when in bookings:
+            key = self._locate(department, when)
+            if counts.get(key, 0) >= SLOT_CAPACITY:
+                return department, when, in_db.get(key, 0)
+            counts[key] = counts.get(key, 0) + 1
+        return None
+
+    def load(self, db):
+        """
+        Rebuild from upcoming, active rows of AppointmentDB.
+        """
+        from database.models import AppointmentDB
+
+        today = datetime.now(self.tz).replace(hour=0, minute=0, second=0, microsecond=0)
+        rows = (
+            db.query(AppointmentDB.department, AppointmentDB.scheduled_at, AppointmentDB.tz)
+            .filter(AppointmentDB.scheduled_at >= today)
+            .filter(AppointmentDB.status.notin_(INACTIVE_STATUSES))
+            .yield_per(10000)
+        )
+        days = {}
+        for department, scheduled_at, tz in rows:
+            key, slot = self._locate(department, self.aware(scheduled_at, tz))
+            day = days.get(key)
+            if day is None:
+                day = days[key] = bytearray(SLOTS_PER_DAY)
+            day[slot] = min(day[slot] + 1, 255)
+        with self._lock:
+            self._days = days
+            self.loaded = True
+
+    def suggest(self, department: str, when: datetime, limit: int = 5,
+                days: int = AVAILABILITY_SEARCH_DAYS):
+        """
+        Free slots within opening hours, nearest to `when` first, never in the past.
+        """
+        now = datetime.now(self.tz)
+        when = max(when.astimezone(self.tz), now)
+        dept = department.strip().casefold()
+        candidates = []
+        for offset in range(-1, days + 1):
+            date = when.date() + timedelta(days=offset)
+            day = self._days.get((dept, date))
+            midnight = self.tz.localize(datetime(date.year, date.month, date.day))
+            for slot in range(OPEN_SLOT, CLOSE_SLOT):
+                if day is not None and day[slot] >= SLOT_CAPACITY:
+                    continue
+                start = self.tz.normalize(midnight + timedelta(minutes=slot * SLOT_MINUTES))
+                if start < now:
+                    continue
+                candidates.append((abs((start - when).total_seconds()), start))
+        candidates.sort(key=lambda c: c[0])
+        return [start for _, start in candidates[:limit]]
+
+
+availability = AvailabilityIndex()
+
+def slot_to_dict(start: datetime):
+    return {"date": start.strftime("%Y-%m-%d"), "time": start.strftime("%H:%M"), "tz": CLINIC_TZ}
+
+def load_availability():
+    from database.database import SessionLocal
+    db = SessionLocal()
+    try:
+        availability.load(db)
+    finally:
+        db.close()
+
+@router.get("/availability")
+def get_availability(
+    department: str,
+    date: Optional[str] = None,
+    time: Optional[str] = None,
+    limit: int = Query(5, ge=1, le=50)
+):
+    tz = pytz.timezone(CLINIC_TZ)
+    try:
+        when = datetime.now(tz)
+        if date:
+            when = tz.localize(datetime.strptime(f"{date} {time or '09:00'}", "%Y-%m-%d %H:%M"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD and time HH:MM")
+
+    if not availability.loaded:
+        load_availability()
+
+    return {
+        "department": department,
+        "requested": slot_to_dict(when),
+        "available": availability.is_free(department, when),
+        "suggestions": [slot_to_dict(s) for s in availability.suggest(department, when, limit)]
+    }
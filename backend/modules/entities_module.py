@@ -1,22 +1,23 @@
 import json
 from fastapi import APIRouter, Body
-from langchain.prompts import PromptTemplate
-from langchain.output_parsers import StructuredOutputParser, ResponseSchema
-from langchain.chains import LLMChain
 from .models import ExtractedText
-from utils import safe_parse_llm_output
-from main import llm
+from utils import safe_parse_llm_output, arun_chain
+from cache import stage_cache, normalize_text
+from singleflight import stage_flight
+from admission import admission
+from resources import LazyChain
 
 router = APIRouter()
 
+# Bump when the prompt changes so cached results are not reused
+PROMPT_VERSION = "1"
+
 response_schemas = [
-    ResponseSchema(name="entities", description="Dictionary with date_phrase, time_phrase, department"),
-    ResponseSchema(name="entities_confidence", description="Confidence score 0-1")
+    ("entities", "Dictionary with date_phrase, time_phrase, department"),
+    ("entities_confidence", "Confidence score 0-1")
 ]
-parser = StructuredOutputParser.from_response_schemas(response_schemas)
 
-prompt = PromptTemplate(
-    template="""
+PROMPT_TEMPLATE = """
 You are a smart appointment assistant capable of understanding casual human language.
 The input is text extracted from a user message, which can be informal, abbreviated, or slightly noisy.
 Your job is to extract the appointment details as structured JSON.
@@ -39,17 +40,11 @@ Instructions:
 5. Return strictly valid JSON. Do not include extra commentary.
 
 {format_instructions}
-""",
-    input_variables=["input_json"],
-    partial_variables={"format_instructions": parser.get_format_instructions()}
-)
-chain = LLMChain(llm=llm, prompt=prompt)
+"""
+llm_chain = LazyChain(PROMPT_TEMPLATE, ["input_json"], response_schemas)
 
-@router.post("/extract-entities")
-def extract_entities(data: ExtractedText = Body(...)):
-    input_json = json.dumps({"raw_text": data.raw_text, "confidence": data.confidence})
-    output_text = chain.run({"input_json": input_json})
-    result = safe_parse_llm_output(parser, output_text)
+def parse_entities_output(output_text: str):
+    result = safe_parse_llm_output(llm_chain.parser, output_text, "entities")
 
     if "entities" in result and isinstance(result["entities"], str):
         try:
@@ -62,3 +57,27 @@ def extract_entities(data: ExtractedText = Body(...)):
         except:
             result["entities_confidence"] = 0.0
     return result
+
+async def aextract_entities(raw_text: str, confidence: float):
+    # Only the relative phrases are cached; normalize_date_phrase resolves
+    # them against the current date on every request.
+    cache_key = stage_cache.make_key(
+        "entities", PROMPT_VERSION, normalize_text(raw_text), round(float(confidence or 0.0), 2)
+    )
+    cached = await stage_cache.aget(cache_key)
+    if cached is not None:
+        return cached
+    return await stage_flight.do(cache_key, _extract_entities, raw_text, confidence, cache_key)
+
+async def _extract_entities(raw_text: str, confidence: float, cache_key: str):
+    input_json = json.dumps({"raw_text": raw_text, "confidence": confidence})
+    output_text = await arun_chain(llm_chain.chain, {"input_json": input_json}, "entities")
+    result = parse_entities_output(output_text)
+    if result.get("entities"):
+        await stage_cache.aset(cache_key, result)
+    return result
+
+@router.post("/extract-entities")
+async def extract_entities(data: ExtractedText = Body(...)):
+    async with admission.slot("text"):
+        return await aextract_entities(data.raw_text, data.confidence)
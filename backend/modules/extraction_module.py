@@ -0,0 +1,51 @@
+import os
+from .models import MergedExtraction
+from utils import arun_chain
+from cache import stage_cache, normalize_text
+from singleflight import stage_flight
+from resources import LazyStructuredChain
+import metrics
+
+# "merged" does OCR cleanup and entity extraction in one structured-output call;
+# "separate" keeps the two-chain flow of ocr_module and entities_module
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "separate")
+
+# Bump when the prompt or schema changes so cached results are not reused
+PROMPT_VERSION = "merged-v1"
+
+# The field list and descriptions travel in the JSON schema, not the prompt
+PROMPT_TEMPLATE = """Fix typos in this appointment request and extract its fields. Use null for anything not stated.
+Request: {input_text}"""
+
+llm_chain = LazyStructuredChain(PROMPT_TEMPLATE, ["input_text"], MergedExtraction)
+
+async def aextract_merged(input_text: str):
+    """
+    Returns the entity extraction shape plus the cleaned text:
+    {raw_text, entities: {date_phrase, time_phrase, department}, entities_confidence}
+    """
+    cache_key = stage_cache.make_key("merged", PROMPT_VERSION, normalize_text(input_text))
+    cached = await stage_cache.aget(cache_key)
+    if cached is not None:
+        return cached
+    return await stage_flight.do(cache_key, _extract_merged, input_text, cache_key)
+
+async def _extract_merged(input_text: str, cache_key: str):
+    output = await arun_chain(llm_chain.chain, {"input_text": input_text}, "merged")
+    parsed = output["parsed"]
+    if parsed is None:
+        metrics.llm_parse_failures.inc(chain="merged", outcome="failed")
+        return {"raw_text": "", "entities": {}, "entities_confidence": 0.0}
+
+    result = {
+        "raw_text": parsed.raw_text,
+        "entities": {
+            "date_phrase": parsed.date_phrase,
+            "time_phrase": parsed.time_phrase,
+            "department": parsed.department
+        },
+        "entities_confidence": parsed.confidence
+    }
+    if result["raw_text"]:
+        await stage_cache.aset(cache_key, result)
+    return result
@@ -0,0 +1,119 @@
+import os, re
+from .normalize_module import normalize_date_phrase, TIME_OF_DAY_MAP
+
+# Inputs scoring at or above this skip the OCR cleanup and entity LLM chains
+FASTPATH_CONFIDENCE_THRESHOLD = float(os.getenv("FASTPATH_CONFIDENCE_THRESHOLD", "0.8"))
+
+DEPARTMENTS = [
+    "dentist", "dental", "cardiologist", "cardiology", "dermatologist", "dermatology",
+    "neurologist", "neurology", "orthopedic", "orthopedics", "orthopaedic", "pediatrician",
+    "pediatrics", "gynecologist", "gynecology", "ophthalmologist", "ophthalmology",
+    "ent", "psychiatrist", "psychiatry", "physiotherapist", "physiotherapy",
+    "oncologist", "oncology", "urologist", "urology", "gastroenterologist",
+    "gastroenterology", "radiology", "general physician", "physician", "eye", "skin"
+]
+
+# Common shorthand the OCR cleanup prompt would otherwise fix
+TYPO_MAP = {
+    "nxt": "next", "tmrw": "tomorrow", "tmr": "tomorrow", "tomorow": "tomorrow",
+    "tommorow": "tomorrow", "tommorrow": "tomorrow", "2day": "today", "2moro": "tomorrow",
+    "dentst": "dentist", "@": "at"
+}
+
+WEEKDAY_ALIASES = {
+    "mon": "monday", "tue": "tuesday", "tues": "tuesday", "wed": "wednesday",
+    "thu": "thursday", "thur": "thursday", "thurs": "thursday", "fri": "friday",
+    "sat": "saturday", "sun": "sunday"
+}
+
+_WEEKDAY = r"(monday|tuesday|wednesday|thursday|friday|saturday|sunday|" + "|".join(WEEKDAY_ALIASES) + r")"
+_MONTH = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*"
+
+DEPARTMENT_RE = re.compile(r"\b(" + "|".join(sorted(map(re.escape, DEPARTMENTS), key=len, reverse=True)) + r")\b")
+DATE_RES = [
+    re.compile(r"\b(today|tomorrow)\b"),
+    re.compile(r"\b(next|this) " + _WEEKDAY + r"\b"),
+    re.compile(r"\b\d{4}-\d{2}-\d{2}\b"),
+    re.compile(r"\b\d{1,2}(?:st|nd|rd|th)? " + _MONTH + r"\b"),
+    re.compile(r"\b" + _MONTH + r" \d{1,2}(?:st|nd|rd|th)?\b"),
+]
+# Words that change or negate the date when they appear outside the matched
+# phrase ("day after tomorrow", "not tomorrow, friday"); the LLM handles those
+DATE_WORDS = {
+    "today", "tomorrow", "yesterday", "after", "before", "next", "this", "last", "week",
+    "weekend", "month", "day", "days", "not", "no", "cant", "cannot", "don", "dont",
+    "instead", "except", "monday", "tuesday", "wednesday", "thursday", "friday",
+    "saturday", "sunday", *WEEKDAY_ALIASES
+}
+
+TIME_RES = [
+    re.compile(r"\b\d{1,2}(?::\d{2})? ?(?:am|pm)\b"),
+    re.compile(r"\b\d{1,2}:\d{2}\b"),
+    re.compile(r"\b(" + "|".join(TIME_OF_DAY_MAP) + r")\b"),
+]
+
+def _clean(text: str) -> str:
+    text = text.lower().replace("@", " at ")
+    text = re.sub(r"[^\w:\-\s]", " ", text)
+    words = [TYPO_MAP.get(w, w) for w in text.split()]
+    return " ".join(words)
+
+def _find_unique(patterns, text: str):
+    """
+    Return (phrase, ambiguous) for the first pattern that matches.
+    More than one distinct match for a slot is treated as ambiguous.
+    """
+    for pattern in patterns:
+        found = {m.group(0) for m in pattern.finditer(text)}
+        if found:
+            return sorted(found)[0], len(found) > 1
+    return None, False
+
+def _has_other_date_words(text: str, date_phrase: str) -> bool:
+    rest = re.sub(r"\b" + re.escape(date_phrase) + r"\b", " ", text)
+    return any(word in DATE_WORDS for word in rest.split())
+
+def fast_extract(input_text: str):
+    """
+    Rule-based extraction of department, date phrase and time phrase.
+    Returns the same shape as the entity extraction step plus the cleaned text.
+    """
+    text = _clean(input_text or "")
+
+    departments = {m.group(1) for m in DEPARTMENT_RE.finditer(text)}
+    date_phrase, date_ambiguous = _find_unique(DATE_RES, text)
+    time_phrase, time_ambiguous = _find_unique(TIME_RES, text)
+
+    date_context = bool(date_phrase) and _has_other_date_words(text, date_phrase)
+    if date_phrase:
+        parts = date_phrase.split()
+        date_phrase = " ".join(WEEKDAY_ALIASES.get(p, p) for p in parts)
+
+    entities = {
+        "date_phrase": date_phrase,
+        "time_phrase": time_phrase,
+        "department": sorted(departments)[0] if departments else None
+    }
+
+    confidence = 0.0
+    if entities["department"] and date_phrase and time_phrase:
+        normalized = normalize_date_phrase(date_phrase, time_phrase)
+        if normalized:
+            confidence = normalized["confidence"]
+        if len(departments) > 1 or date_ambiguous or time_ambiguous or date_context:
+            confidence *= 0.5
+
+    return {
+        "raw_text": text,
+        "entities": entities,
+        "entities_confidence": round(confidence, 2)
+    }
+
+def try_fast_extract(input_text: str):
+    """
+    Returns the fast-path entities when confident enough, otherwise None.
+    """
+    result = fast_extract(input_text)
+    if result["entities_confidence"] >= FASTPATH_CONFIDENCE_THRESHOLD:
+        return result
+    return None
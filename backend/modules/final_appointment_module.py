@@ -1,22 +1,26 @@
-import json
-from fastapi import APIRouter, Body
-from langchain.prompts import PromptTemplate
-from langchain.output_parsers import StructuredOutputParser, ResponseSchema
-from langchain.chains import LLMChain
-from .models import FinalInput, PrepareFinalInput
-from utils import safe_parse_llm_output
-from main import llm
+import json, os
+from fastapi import APIRouter, Body, Query
+from pydantic import ValidationError
+from .models import FinalInput, PrepareFinalInput, Appointment
+from utils import safe_parse_llm_output, arun_chain
+from resources import LazyChain
+from singleflight import stage_flight
+from admission import admission
+from resilience import LLMUnavailable
+import metrics
 
 router = APIRouter()
 
+# The appointment is assembled deterministically; the LLM is only consulted
+# when that fails and the fallback is enabled (globally or per request).
+LLM_FALLBACK = os.getenv("FINAL_APPOINTMENT_LLM_FALLBACK", "false").lower() == "true"
+
 response_schemas = [
-    ResponseSchema(name="appointment", description="Final appointment JSON"),
-    ResponseSchema(name="status", description="Status of appointment")
+    ("appointment", "Final appointment JSON"),
+    ("status", "Status of appointment")
 ]
-parser = StructuredOutputParser.from_response_schemas(response_schemas)
 
-prompt = PromptTemplate(
-    template="""
+PROMPT_TEMPLATE = """
 You are a final appointment agent.
 
 Input JSON from normalization step:
@@ -44,23 +48,56 @@ Example output:
 Return strictly as JSON (do NOT put the appointment inside quotes).
 
 {format_instructions}
-""",
-    input_variables=["input_json"],
-    partial_variables={"format_instructions": parser.get_format_instructions()}
-)
+"""
 
-chain = LLMChain(llm=llm, prompt=prompt)
+llm_chain = LazyChain(PROMPT_TEMPLATE, ["input_json"], response_schemas)
 
 @router.post("/prepare-final-input")
 def prepare_final_input(data: PrepareFinalInput = Body(...)):
     return {"normalized": data.normalized_output, "entities": data.entities_output}
 
-@router.post("/final-appointment")
-def final_appointment(data: FinalInput = Body(...)):
+def build_final_input(data: FinalInput):
     input_dict = data.normalized.copy()
     if data.entities and "entities" in data.entities:
         dept = data.entities.get("entities", {}).get("department")
         if dept:
             input_dict["department"] = dept
-    output_text = chain.run({"input_json": json.dumps(input_dict)})
-    return safe_parse_llm_output(parser, output_text)
+    return input_dict
+
+def assemble_final_appointment(input_dict: dict):
+    appointment = Appointment(
+        department=input_dict.get("department"),
+        date=input_dict.get("date"),
+        time=input_dict.get("time"),
+        tz=input_dict.get("tz") or "Asia/Kolkata"
+    )
+    return {"appointment": appointment.model_dump(), "status": "ok"}
+
+async def afinal_appointment(data: FinalInput, use_llm: bool = LLM_FALLBACK):
+    input_dict = build_final_input(data)
+    try:
+        return assemble_final_appointment(input_dict)
+    except ValidationError as e:
+        clarification = {
+            "status": "needs_clarification",
+            "message": "Missing or invalid appointment fields",
+            "fields": sorted({str(err["loc"][0]) for err in e.errors()})
+        }
+        if not use_llm:
+            return clarification
+
+    input_json = json.dumps(input_dict, sort_keys=True)
+    try:
+        return await stage_flight.do(("final", input_json), _final_appointment_llm, input_json)
+    except LLMUnavailable:
+        metrics.llm_fallbacks.inc(stage="final")
+        return clarification
+
+async def _final_appointment_llm(input_json: str):
+    output_text = await arun_chain(llm_chain.chain, {"input_json": input_json}, "final")
+    return safe_parse_llm_output(llm_chain.parser, output_text, "final")
+
+@router.post("/final-appointment")
+async def final_appointment(data: FinalInput = Body(...), use_llm: bool = Query(LLM_FALLBACK)):
+    async with admission.slot("text"):
+        return await afinal_appointment(data, use_llm=use_llm)
@@ -1,73 +1,30 @@
-import json
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from .models import ExtractedText, EntitiesData, PrepareFinalInput, FinalInput
-from .ocr_module import extract_text_from_image_file
-from .entities_module import chain as entities_chain, parser as entities_parser
-from .normalize_module import normalize_datetime
-from .final_appointment_module import prepare_final_input, final_appointment
-from utils import safe_parse_llm_output
+import hashlib
+from fastapi import APIRouter, File, UploadFile, HTTPException, Response, Query
+from .pipeline_engine import image_pipeline, PipelineContext
+from singleflight import pipeline_flight
+from admission import admission
 
 router = APIRouter()
 
 @router.post("/pipeline/image")
-async def run_image_pipeline(file: UploadFile = File(...)):
+async def run_image_pipeline(response: Response, file: UploadFile = File(...), stream: bool = Query(False)):
     if not file:
         raise HTTPException(status_code=400, detail="Image file must be provided")
 
-    # STEP 1: Text Extraction 
-    try:
-        extracted = extract_text_from_image_file(file)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Step 1 (OCR) failed: {e}")
-
-    # STEP 2: Entity Extraction 
-    try:
-        input_json = json.dumps({
-            "raw_text": extracted.get("raw_text", ""),
-            "confidence": extracted.get("confidence", 0.0)
-        })
-        entities_output = entities_chain.run({"input_json": input_json})
-        entities_result = safe_parse_llm_output(entities_parser, entities_output)
-
-        if "entities" in entities_result and isinstance(entities_result["entities"], str):
-            try:
-                entities_result["entities"] = json.loads(entities_result["entities"])
-            except:
-                entities_result["entities"] = {}
-        if "entities_confidence" in entities_result:
-            try:
-                entities_result["entities_confidence"] = float(entities_result["entities_confidence"])
-            except:
-                entities_result["entities_confidence"] = 0.0
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Step 2 (Entity Extraction) failed: {e}")
-
-    # STEP 3: Normalize Date/Time -
-    try:
-        normalized_result = normalize_datetime(EntitiesData(
-            entities=entities_result.get("entities", {}),
-            entities_confidence=entities_result.get("entities_confidence", 0.0)
-        ))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Step 3 (Normalization) failed: {e}")
-
-    # STEP 4: Preparing Final Input 
-    try:
-        combined_input = PrepareFinalInput(
-            normalized_output=normalized_result.get("normalized", {}),
-            entities_output=entities_result
-        )
-        prepared_input = prepare_final_input(combined_input)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Step 4 (Prepare Final Input) failed: {e}")
-
-    # STEP 5: Final Appointment 
-    try:
-        final_result = final_appointment(FinalInput(
-            normalized=prepared_input["normalized"],
-            entities=prepared_input["entities"]
-        ))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Step 5 (Final Appointment) failed: {e}")
-
-    return final_result
+    # Read the upload up front; the stream outlives the request body
+    image_bytes = await file.read()
+    if stream:
+        ctx = PipelineContext(image_bytes=image_bytes)
+        return await admission.streaming_response("image", image_pipeline.stream(ctx), media_type="application/x-ndjson")
+
+    # Identical uploads in flight (client retries) share one run
+    key = ("image", hashlib.sha256(image_bytes).hexdigest())
+    result, server_timing = await pipeline_flight.do(key, run_image, image_bytes)
+    response.headers["Server-Timing"] = server_timing
+    return result
+
+async def run_image(image_bytes: bytes):
+    ctx = PipelineContext(image_bytes=image_bytes)
+    async with admission.slot("image"):
+        result = await image_pipeline.run(ctx)
+    return result, ctx.server_timing()
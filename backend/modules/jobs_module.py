@@ -0,0 +1,56 @@
+import uuid
+from typing import Optional
+from fastapi import APIRouter, Body, File, Form, HTTPException, UploadFile
+from celery.result import AsyncResult
+from celery_app import celery
+import pipeline_tasks
+from pipeline_tasks import run_pipeline_job
+from .models import TextJobInput
+import job_store
+
+router = APIRouter()
+
+# Celery states as reported to clients; SUCCESS carries the job's own status
+JOB_STATES = {"PENDING": "queued", "RECEIVED": "queued", "RETRY": "queued", "STARTED": "running", "FAILURE": "failed"}
+
+def check_callback_url(callback_url: Optional[str]):
+    if not callback_url:
+        return
+    try:
+        pipeline_tasks.check_callback_url(callback_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def submit(kind: str, payload: dict, callback_url: Optional[str], job_id: str):
+    run_pipeline_job.apply_async(args=[kind, payload, callback_url], task_id=job_id)
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+@router.post("/jobs/pipeline/text", status_code=202)
+def submit_text_job(data: TextJobInput = Body(...)):
+    if not data.input_text:
+        raise HTTPException(status_code=400, detail="Text input must be provided")
+    check_callback_url(data.callback_url)
+    return submit("text", {"input_text": data.input_text}, data.callback_url, str(uuid.uuid4()))
+
+@router.post("/jobs/pipeline/image", status_code=202)
+def submit_image_job(file: UploadFile = File(...), callback_url: Optional[str] = Form(None)):
+    check_callback_url(callback_url)
+    image_bytes = file.file.read()
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Image file must be provided")
+
+    # Only a reference goes through the broker
+    job_id = str(uuid.uuid4())
+    image_ref = job_store.put_image(job_id, image_bytes)
+    return submit("image", {"image_ref": image_ref}, callback_url, job_id)
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    # Unknown and expired ids are indistinguishable from queued ones
+    result = AsyncResult(job_id, app=celery)
+    if result.state == "SUCCESS":
+        return {"job_id": job_id, **result.result}
+    response = {"job_id": job_id, "status": JOB_STATES.get(result.state, result.state.lower())}
+    if result.state == "FAILURE":
+        response["detail"] = str(result.result)
+    return response
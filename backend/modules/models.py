@@ -1,5 +1,7 @@
-from pydantic import BaseModel
+from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
 from typing import Dict, Optional
+import pytz
 
 # Input models
 class TextInput(BaseModel):
@@ -9,6 +11,14 @@ class ExtractedText(BaseModel):
     raw_text: str
     confidence: float
 
+# Native JSON-schema output of the merged extraction call; descriptions are sent to the model
+class MergedExtraction(BaseModel):
+    raw_text: str = Field(description="input with typos fixed")
+    department: Optional[str] = Field(None, description="medical department or specialist")
+    date_phrase: Optional[str] = Field(None, description="date as written, e.g. next friday")
+    time_phrase: Optional[str] = Field(None, description="time as written, e.g. 3pm")
+    confidence: float = Field(description="0-1")
+
 class EntitiesData(BaseModel):
     entities: dict
     entities_confidence: float
@@ -28,3 +38,41 @@ class FinalInput(BaseModel):
 
 class PipelineInput(BaseModel):
     input_text: str
+
+class TextJobInput(BaseModel):
+    input_text: str
+    callback_url: Optional[str] = None
+
+
+# Output models
+class Appointment(BaseModel):
+    department: str
+    date: str
+    time: str
+    tz: str = "Asia/Kolkata"
+
+    @field_validator("department")
+    @classmethod
+    def department_not_blank(cls, v):
+        if not v.strip():
+            raise ValueError("department must not be empty")
+        return v.strip()
+
+    @field_validator("date")
+    @classmethod
+    def date_is_iso(cls, v):
+        datetime.strptime(v, "%Y-%m-%d")
+        return v
+
+    @field_validator("time")
+    @classmethod
+    def time_is_hh_mm(cls, v):
+        datetime.strptime(v, "%H:%M")
+        return v
+
+    @field_validator("tz")
+    @classmethod
+    def tz_is_known(cls, v):
+        if v not in pytz.all_timezones_set:
+            raise ValueError(f"unknown timezone {v}")
+        return v
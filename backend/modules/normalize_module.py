@@ -3,6 +3,7 @@ from fastapi import APIRouter, Body
 import pytz, re
 from dateutil import parser as date_parser
 from .models import EntitiesData
+from .availability_module import availability, slot_to_dict
 
 router = APIRouter()
 
@@ -19,9 +20,9 @@ TIME_OF_DAY_MAP = {
 
 CONFIDENCE_THRESHOLD = 0.7
 
-def normalize_date_phrase(date_phrase: str, time_phrase: str, tz_str="Asia/Kolkata"):
+def normalize_date_phrase(date_phrase: str, time_phrase: str, tz_str="Asia/Kolkata", now=None):
     tz = pytz.timezone(tz_str)
-    now = datetime.now(tz)
+    now = now.astimezone(tz) if now else datetime.now(tz)
     weekdays = {
         "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
         "friday": 4, "saturday": 5, "sunday": 6
@@ -105,23 +106,41 @@ def normalize_date_phrase(date_phrase: str, time_phrase: str, tz_str="Asia/Kolka
 
 @router.post("/normalize-datetime")
 def normalize_datetime(data: EntitiesData = Body(...)):
-    entities = data.entities
-    if not entities or "date_phrase" not in entities or "time_phrase" not in entities:
-        return {"status": "needs_clarification", "message": "Ambiguous date/time or department"}
+    return normalize_entities(data.entities)
+
+def clarification(entities: dict, candidate: dict = None):
+    """
+    needs_clarification response, with the nearest free slots for the
+    department when it is known (around the low-confidence guess, if any).
+    """
+    response = {"status": "needs_clarification", "message": "Ambiguous date/time or department"}
+    department = (entities or {}).get("department")
+    if department and availability.loaded:
+        tz = pytz.timezone("Asia/Kolkata")
+        when = datetime.now(tz)
+        if candidate:
+            when = tz.localize(datetime.strptime(f"{candidate['date']} {candidate['time']}", "%Y-%m-%d %H:%M"))
+        response["suggestions"] = [slot_to_dict(s) for s in availability.suggest(department, when)]
+    return response
+
+def normalize_entities(entities: dict, now=None):
+    if not entities or not entities.get("date_phrase") or "time_phrase" not in entities:
+        return clarification(entities)
 
     normalized = normalize_date_phrase(
         date_phrase=entities.get("date_phrase", ""),
         time_phrase=entities.get("time_phrase", ""),
-        tz_str="Asia/Kolkata"
+        tz_str="Asia/Kolkata",
+        now=now
     )
 
     # 🚨 Guardrail: failed parsing
     if not normalized:
-        return {"status": "needs_clarification", "message": "Ambiguous date/time or department"}
+        return clarification(entities)
 
     # 🚨 Guardrail: low confidence
     if normalized["confidence"] < CONFIDENCE_THRESHOLD:
-        return {"status": "needs_clarification", "message": "Ambiguous date/time or department"}
+        return clarification(entities, normalized)
 
     return {
         "normalized": {
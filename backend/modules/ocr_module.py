@@ -1,29 +1,29 @@
-import io, json
+import hashlib, json
 from fastapi import APIRouter, Body, File, UploadFile, HTTPException
-from PIL import Image
-import easyocr
-from langchain.prompts import PromptTemplate
-from langchain.output_parsers import StructuredOutputParser, ResponseSchema
-from langchain.chains import LLMChain
 from .models import TextInput
-from utils import safe_parse_llm_output
-from main import llm
+from utils import safe_parse_llm_output, arun_chain
+from cache import stage_cache, ocr_cache, normalize_text
+from singleflight import stage_flight
+from admission import admission
+from resilience import LLMUnavailable
+import ocr_pool
+from resources import LazyChain
 
 router = APIRouter()
 
-# Initialize EasyOCR reader (English, GPU if available)
-reader = easyocr.Reader(['en'], gpu=True)  # set gpu=False if no GPU
+# Bump when the prompt changes so cached results are not reused
+PROMPT_VERSION = "1"
+# Bump when OCR preprocessing changes
+OCR_VERSION = "2"
 
-# Schema + Parser
+# Schema
 response_schemas = [
-    ResponseSchema(name="raw_text", description="Extracted text from input"),
-    ResponseSchema(name="confidence", description="Confidence score (0.0-1.0)")
+    ("raw_text", "Extracted text from input"),
+    ("confidence", "Confidence score (0.0-1.0)")
 ]
-parser = StructuredOutputParser.from_response_schemas(response_schemas)
 
-# Prompt + Chain
-prompt = PromptTemplate(
-    template="""
+# Prompt
+PROMPT_TEMPLATE = """
 You are an OCR/Text extraction assistant.
 
 Your job:
@@ -38,43 +38,66 @@ Input: {input_text}
 
 Return JSON:
 {format_instructions}
-""",
-    input_variables=["input_text"],
-    partial_variables={"format_instructions": parser.get_format_instructions()}
-)
-chain = LLMChain(llm=llm, prompt=prompt)
+"""
+
+# Parser + Chain, built on first use
+llm_chain = LazyChain(PROMPT_TEMPLATE, ["input_text"], response_schemas)
 
 # ----------------- Helper -----------------
-def extract_text_from_image_file(file: UploadFile):
+async def aextract_text(input_text: str):
+    cache_key = stage_cache.make_key("ocr", PROMPT_VERSION, normalize_text(input_text))
+    cached = await stage_cache.aget(cache_key)
+    if cached is not None:
+        return cached
+    return await stage_flight.do(cache_key, _extract_text, input_text, cache_key)
+
+async def _extract_text(input_text: str, cache_key: str):
+    output_text = await arun_chain(llm_chain.chain, {"input_text": input_text}, "ocr_cleanup")
+    result = safe_parse_llm_output(llm_chain.parser, output_text, "ocr_cleanup")
+    if "raw_text" in result:
+        await stage_cache.aset(cache_key, result)
+    return result
+
+async def aocr_image_bytes(image_bytes: bytes) -> str:
+    cache_key = ocr_cache.make_key("sha256", OCR_VERSION, hashlib.sha256(image_bytes).hexdigest())
+    cached = await ocr_cache.aget(cache_key)
+    if cached is not None:
+        return cached
+    return await stage_flight.do(cache_key, _ocr_image_bytes, image_bytes, cache_key)
+
+async def _ocr_image_bytes(image_bytes: bytes, cache_key: str):
+    # EasyOCR runs on the OCR worker pool, off the event loop
     try:
-        # Read image bytes
-        image_bytes = file.file.read()
-        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        raw_text = await ocr_pool.recognize(image_bytes)
+    except ocr_pool.OCRQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"OCR busy: {e}", headers={"Retry-After": "5"})
 
-        # OCR using EasyOCR
-        ocr_results = reader.readtext(image_bytes)
-        raw_text = " ".join([text[1] for text in ocr_results]).strip()
+    await ocr_cache.aset(cache_key, raw_text)
+    return raw_text
 
-        if not raw_text:
-            raw_text = "No clear text found in image."
+async def aocr_image_file(file: UploadFile) -> str:
+    return await aocr_image_bytes(await file.read())
 
-        # Feed raw text to LLM for structured extraction
-        output_text = chain.run({"input_text": raw_text})
-        result = safe_parse_llm_output(parser, output_text)
-        return result
+async def aextract_text_from_image_file(file: UploadFile):
+    try:
+        raw_text = await aocr_image_file(file)
+        return await aextract_text(raw_text)
+    except (HTTPException, LLMUnavailable):
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"LLM OCR failed: {e}")
 
 # ----------------- Endpoints -----------------
 @router.post("/extract-text")
-def extract_text(data: TextInput = Body(...)):
-    output_text = chain.run({"input_text": data.input_text})
-    return safe_parse_llm_output(parser, output_text)
+async def extract_text(data: TextInput = Body(...)):
+    async with admission.slot("text"):
+        return await aextract_text(data.input_text)
 
 @router.post("/extract-text-from-image")
 async def extract_text_from_image_endpoint(file: UploadFile = File(...)):
     """
     Accepts an image file and returns structured OCR text with confidence.
     """
-    result = extract_text_from_image_file(file)
+    async with admission.slot("image"):
+        result = await aextract_text_from_image_file(file)
     return result
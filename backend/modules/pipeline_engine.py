@@ -0,0 +1,198 @@
+import json, time
+from fastapi import HTTPException
+import metrics
+from resilience import LLMUnavailable
+import ocr_pool
+from .models import PrepareFinalInput, FinalInput
+from .ocr_module import aocr_image_bytes, aextract_text
+from .entities_module import aextract_entities
+from .normalize_module import normalize_entities
+from .final_appointment_module import prepare_final_input, afinal_appointment
+from .fastpath_module import try_fast_extract, fast_extract, FASTPATH_CONFIDENCE_THRESHOLD
+from .extraction_module import EXTRACTION_MODE, aextract_merged
+
+
+class PipelineHalt(Exception):
+    """
+    Raised by a stage to end the run early and return `response` as-is.
+    """
+    def __init__(self, response: dict):
+        super().__init__(response.get("message", "pipeline halted"))
+        self.response = response
+
+
+class PipelineContext:
+    def __init__(self, **data):
+        self.data = data
+        self.timings = {}
+        self.result = None
+        self.halted = False
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.timings.items())
+
+
+class Stage:
+    def __init__(self, name: str, label: str, func):
+        self.name = name
+        self.label = label
+        self.func = func
+
+
+class Pipeline:
+    """
+    Runs stages in order over a shared context, recording each stage's
+    wall time in milliseconds. A stage may raise PipelineHalt to short-circuit
+    the remaining stages; any other exception becomes an HTTP 500.
+    `start`/`stop` run a slice of the stages, e.g. to batch one stage
+    across many contexts.
+    """
+    def __init__(self, stages):
+        self.stages = stages
+
+    def index(self, name: str) -> int:
+        return [stage.name for stage in self.stages].index(name)
+
+    async def _execute(self, ctx: PipelineContext, start: int = 0, stop: int = None):
+        """
+        Yields (stage, output) as each stage completes.
+        """
+        if ctx.halted:
+            return
+        for step, stage in enumerate(self.stages[start:stop], start=start + 1):
+            began = time.perf_counter()
+            try:
+                output = await stage.func(ctx)
+            except PipelineHalt as halt:
+                ctx.result = {**halt.response, "stage": stage.name}
+                ctx.halted = True
+                return
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Step {step} ({stage.label}) failed: {e}")
+            finally:
+                elapsed = time.perf_counter() - began
+                ctx.timings[stage.name] = elapsed * 1000
+                metrics.stage_seconds.observe(elapsed, stage=stage.name)
+            yield stage, output
+
+    async def run(self, ctx: PipelineContext, start: int = 0, stop: int = None):
+        async for _ in self._execute(ctx, start, stop):
+            pass
+        return ctx.result
+
+    async def stream(self, ctx: PipelineContext):
+        """
+        NDJSON events: one "stage" line per completed stage, then a final
+        "result" or "error" line. Cancelling the response cancels the run.
+        """
+        try:
+            async for stage, output in self._execute(ctx):
+                yield json.dumps({
+                    "event": "stage",
+                    "stage": stage.name,
+                    "duration_ms": round(ctx.timings[stage.name], 1),
+                    "output": output
+                }) + "\n"
+            yield json.dumps({"event": "result", "result": ctx.result, "timings_ms": {
+                name: round(ms, 1) for name, ms in ctx.timings.items()
+            }}) + "\n"
+        except HTTPException as e:
+            yield json.dumps({"event": "error", "status_code": e.status_code, "detail": e.detail}) + "\n"
+
+
+def clarification(message: str = "Ambiguous date/time or department"):
+    return {"status": "needs_clarification", "message": message}
+
+
+def llm_fallback(stage: str, text: str):
+    """
+    Rule-based extraction while the LLM is unavailable. Below the fast-path
+    threshold the guess isn't booked; the user is asked to rephrase.
+    """
+    metrics.llm_fallbacks.inc(stage=stage)
+    result = fast_extract(text)
+    if result["entities_confidence"] < FASTPATH_CONFIDENCE_THRESHOLD:
+        raise PipelineHalt(clarification(
+            "Could not read appointment details reliably, please state the department, date and time"
+        ))
+    return result
+
+
+# ----------------- Stages -----------------
+async def ocr_stage(ctx: PipelineContext):
+    ctx.data["raw_text"] = await aocr_image_bytes(ctx.data["image_bytes"])
+    # Nothing to extract from; skip the LLM stages
+    if not ctx.data["raw_text"].strip() or ctx.data["raw_text"] == ocr_pool.NO_TEXT_FOUND:
+        raise PipelineHalt(clarification("No readable text found in the image"))
+    return {"raw_text": ctx.data["raw_text"]}
+
+async def extract_text_stage(ctx: PipelineContext):
+    raw_text = ctx.data["raw_text"]
+
+    # Fast path: rule-based extraction for common phrasings, no LLM calls
+    fast = try_fast_extract(raw_text)
+    if fast:
+        ctx.data["entities_result"] = fast
+        return {"raw_text": fast["raw_text"], "source": "fastpath"}
+
+    merged = EXTRACTION_MODE == "merged"
+    try:
+        extracted = await (aextract_merged(raw_text) if merged else aextract_text(raw_text))
+    except LLMUnavailable:
+        ctx.data["entities_result"] = llm_fallback("extract", raw_text)
+        return {"raw_text": ctx.data["entities_result"]["raw_text"], "source": "fallback"}
+    if not extracted.get("raw_text"):
+        raise PipelineHalt(clarification("Could not read appointment details from the input"))
+    if merged:
+        # One structured call returned the cleaned text and the entities
+        ctx.data["entities_result"] = extracted
+        return {"raw_text": extracted["raw_text"], "source": "merged"}
+    ctx.data["extracted"] = extracted
+    return extracted
+
+async def entities_stage(ctx: PipelineContext):
+    if "entities_result" not in ctx.data:
+        extracted = ctx.data["extracted"]
+        try:
+            ctx.data["entities_result"] = await aextract_entities(
+                extracted.get("raw_text", ""),
+                extracted.get("confidence", 0.0)
+            )
+        except LLMUnavailable:
+            ctx.data["entities_result"] = llm_fallback("entities", extracted.get("raw_text", ""))
+    return ctx.data["entities_result"]
+
+async def normalize_stage(ctx: PipelineContext):
+    entities_result = ctx.data["entities_result"]
+    normalized_result = normalize_entities(
+        entities_result.get("entities") or {},
+        now=ctx.data.get("now")
+    )
+    if normalized_result.get("status") == "needs_clarification":
+        raise PipelineHalt(normalized_result)
+    ctx.data["normalized_result"] = normalized_result
+    return normalized_result
+
+async def final_stage(ctx: PipelineContext):
+    prepared_input = prepare_final_input(PrepareFinalInput(
+        normalized_output=ctx.data["normalized_result"].get("normalized", {}),
+        entities_output=ctx.data["entities_result"]
+    ))
+    ctx.result = await afinal_appointment(FinalInput(
+        normalized=prepared_input["normalized"],
+        entities=prepared_input["entities"]
+    ))
+    return ctx.result
+
+
+TEXT_STAGES = [
+    Stage("extract", "OCR", extract_text_stage),
+    Stage("entities", "Entity Extraction", entities_stage),
+    Stage("normalize", "Normalization", normalize_stage),
+    Stage("final", "Final Appointment", final_stage),
+]
+
+text_pipeline = Pipeline(TEXT_STAGES)
+image_pipeline = Pipeline([Stage("ocr", "OCR", ocr_stage)] + TEXT_STAGES)
@@ -1,60 +1,237 @@
-from fastapi import APIRouter, HTTPException, Depends
+import base64, os, uuid
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Body, Query
 from datetime import datetime
 import pytz
-from celery_app import run_appointment
+import metrics
+from dispatcher import DISPATCH_HORIZON_SECONDS
+from cache import appointment_cache, APPOINTMENT_CACHE_TTL
 # scheduler_module.py
 from tasks import schedule_appointment  # instead of run_appointment
+from .models import Appointment
+from .availability_module import availability, load_availability, slot_to_dict, HOLDING_STATUSES
 
 # importing db dependencies
 from sqlalchemy.orm import Session
-from database.database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.database import get_db, get_async_db
 from database import crud
 
 router = APIRouter()
 
-#Getting DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+SCHEDULE_BULK_MAX = int(os.getenv("SCHEDULE_BULK_MAX", "50000"))
+APPOINTMENTS_PAGE_MAX = int(os.getenv("APPOINTMENTS_PAGE_MAX", "500"))
+# Statuses no worker will change again
+FINAL_STATUSES = ("done", "failed", "cancelled", "expired")
+
+def slot_conflict(department: str, run_time: datetime):
+    return HTTPException(status_code=409, detail={
+        "message": f"{department.strip()} is already booked at {run_time.strftime('%Y-%m-%d %H:%M')}",
+        "suggestions": [slot_to_dict(s) for s in availability.suggest(department, run_time)]
+    })
+
+def reserve_slot(db: Session, department: str, run_time: datetime, pending=()) -> bool:
+    """
+    Count the booking in the availability index. The index is per process
+    and goes stale when another worker cancels, so a slot it reports full
+    is re-read from the table before giving up. `pending` are bookings of
+    the same request that are reserved but not yet inserted.
+    """
+    if not availability.loaded:
+        load_availability()
+    if availability.reserve(department, run_time):
+        return True
+    in_db = sum(availability.db_counts(db, [(department, run_time)]).values())
+    held = sum(1 for booking in pending if availability.same_slot(booking, (department, run_time)))
+    availability.set_count(department, run_time, in_db + held)
+    return availability.reserve(department, run_time)
+
+def get_run_time(appointment: dict):
+    tz = pytz.timezone(appointment.get("tz") or "Asia/Kolkata")
+    return tz.localize(datetime.strptime(
+        f"{appointment['date']} {appointment['time']}", "%Y-%m-%d %H:%M"
+    ))
 
 @router.post("/scheduler/schedule")
-async def schedule_task(payload: dict):
+def schedule_task(payload: dict, db: Session = Depends(get_db)):
+    with metrics.stage_seconds.time(stage="schedule"):
+        return schedule_appointment_row(payload, db)
+
+def schedule_appointment_row(payload: dict, db: Session):
     appointment = payload.get("appointment")
     if not appointment:
         raise HTTPException(status_code=400, detail="Missing appointment data")
 
-    tz = pytz.timezone("Asia/Kolkata")
-    run_time = tz.localize(datetime.strptime(
-        f"{appointment['date']} {appointment['time']}", "%Y-%m-%d %H:%M"
-    ))
+    run_time = get_run_time(appointment)
+    if not reserve_slot(db, appointment["department"], run_time):
+        raise slot_conflict(appointment["department"], run_time)
 
     print(f"[Scheduler] Appointment scheduled for {run_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
 
-   
-    task = run_appointment.apply_async(args=[appointment], eta=run_time)
-
-   
-    db = next(get_db())
-    crud.create_appointment(db, task.id, appointment, run_time)
-    db.close()
+    # The row is the source of truth; the dispatcher enqueues it once due.
+    # The id is reused as the Celery task id.
+    task_id = str(uuid.uuid4())
+    try:
+        # The index is per process; the table decides across workers
+        full = availability.first_full_in_db(db, [(appointment["department"], run_time)])
+        if not full:
+            crud.create_appointment(db, task_id, appointment, run_time)
+    except Exception:
+        availability.release(appointment["department"], run_time)
+        raise
+    if full:
+        db.rollback()
+        availability.set_count(appointment["department"], run_time, full[2])
+        raise slot_conflict(appointment["department"], run_time)
 
     return {
-        "task_id": task.id,
+        "task_id": task_id,
         "status": "scheduled",
         "run_at": run_time.isoformat()
     }
 
+@router.post("/scheduler/schedule/bulk")
+def schedule_tasks_bulk(
+    appointments: List[Appointment] = Body(..., embed=True),
+    check_availability: bool = Query(True),
+    db: Session = Depends(get_db)
+):
+    with metrics.stage_seconds.time(stage="schedule_bulk"):
+        return schedule_rows_bulk(appointments, check_availability, db)
+
+def schedule_rows_bulk(appointments: List[Appointment], check_availability: bool, db: Session):
+    if not appointments:
+        raise HTTPException(status_code=400, detail="Missing appointment data")
+    if len(appointments) > SCHEDULE_BULK_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {SCHEDULE_BULK_MAX} appointments per request")
+
+    appointments = [a.model_dump() for a in appointments]
+    run_times = [get_run_time(a) for a in appointments]
+    task_ids = [str(uuid.uuid4()) for _ in appointments]
+
+    # Imports of existing bookings may pass check_availability=false to
+    # keep historical double bookings; the slots are still counted.
+    if not availability.loaded:
+        load_availability()
+    reserved = []
+    for a, run_at in zip(appointments, run_times):
+        if check_availability:
+            free = reserve_slot(db, a["department"], run_at, reserved)
+        else:
+            free = availability.reserve(a["department"], run_at, force=True)
+        if not free:
+            # Suggestions first, while this request's slots still count as taken
+            conflict = slot_conflict(a["department"], run_at)
+            db.rollback()
+            for department, at in reserved:
+                availability.release(department, at)
+            raise conflict
+        reserved.append((a["department"], run_at))
+
+    try:
+        if check_availability:
+            full = availability.first_full_in_db(db, reserved)
+            if full:
+                db.rollback()
+                for department, at in reserved:
+                    availability.release(department, at)
+                department, at, in_db = full
+                availability.set_count(department, at, in_db)
+                raise slot_conflict(department, at)
+        crud.create_appointments_bulk(db, task_ids, appointments, run_times)
+        db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        for department, at in reserved:
+            availability.release(department, at)
+        raise HTTPException(status_code=500, detail=f"Bulk scheduling failed: {e}")
+
+    print(f"[Scheduler] {len(task_ids)} appointments scheduled in bulk")
+
+    return {
+        "count": len(task_ids),
+        "status": "scheduled",
+        "task_ids": task_ids,
+        "run_at": [r.isoformat() for r in run_times]
+    }
+
+def encode_cursor(task) -> str:
+    raw = f"{task.scheduled_at.isoformat()}|{task.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        scheduled_at, task_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(scheduled_at), int(task_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/appointments")
-def get_appointments(db: Session = Depends(get_db)):
-    tasks = crud.get_all_appointments(db)
-    return tasks
+async def get_appointments(
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    department: Optional[str] = None,
+    status: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    limit = min(limit, APPOINTMENTS_PAGE_MAX)
+    tasks = await crud.alist_appointments(
+        db, limit + 1,
+        after=decode_cursor(cursor) if cursor else None,
+        start=start, end=end, department=department, status=status
+    )
+    page = tasks[:limit]
+    return {
+        "items": [crud.to_dict(task) for task in page],
+        "next_cursor": encode_cursor(page[-1]) if len(tasks) > limit else None
+    }
+
+def appointment_cache_ttl(appointment: dict) -> int:
+    """
+    How long a lookup may be served from cache. Workers update rows in other
+    processes, so a scheduled row is only cached until the dispatcher may
+    pick it up, and queued/triggered rows are not cached at all.
+    """
+    if appointment["status"] in FINAL_STATUSES:
+        return APPOINTMENT_CACHE_TTL
+    if appointment["status"] == "scheduled" and appointment["scheduled_at"]:
+        due = datetime.fromisoformat(appointment["scheduled_at"])
+        if due.tzinfo is None:
+            due = pytz.utc.localize(due)
+        remaining = (due - datetime.now(pytz.utc)).total_seconds() - DISPATCH_HORIZON_SECONDS
+        return int(min(max(remaining, 0), APPOINTMENT_CACHE_TTL))
+    return 0
 
 @router.get("/appointments/{task_id}")
-def get_appointment(task_id: str, db: Session = Depends(get_db)):
+async def get_appointment(task_id: str, db: AsyncSession = Depends(get_async_db)):
+    key = appointment_cache.make_key(task_id)
+    appointment = await appointment_cache.aget(key)
+    if appointment is None:
+        task = await crud.aget_appointment(db, task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="Appointment not found")
+        appointment = crud.to_dict(task)
+        ttl = appointment_cache_ttl(appointment)
+        if ttl:
+            await appointment_cache.aset(key, appointment, ttl=ttl)
+    return appointment
+
+@router.post("/appointments/{task_id}/cancel")
+def cancel_appointment(task_id: str, db: Session = Depends(get_db)):
     task = crud.get_appointment(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Appointment not found")
-    return task
\ No newline at end of file
+
+    # Rows in FINAL_STATUSES are returned unchanged, keeping their history.
+    # Workers refuse rows that are no longer scheduled/queued.
+    if task.status not in FINAL_STATUSES:
+        held = crud.cancel_appointment(db, task_id, HOLDING_STATUSES)
+        db.refresh(task)
+        if held and task.scheduled_at and availability.loaded:
+            availability.release(task.department, availability.aware(task.scheduled_at, task.tz))
+
+    return crud.to_dict(task)
@@ -1,76 +1,93 @@
-import json
-from fastapi import APIRouter, Body, HTTPException
-from .models import PipelineInput, ExtractedText, EntitiesData, PrepareFinalInput, FinalInput
-from .ocr_module import chain as ocr_chain, parser as ocr_parser
-from .entities_module import chain as entities_chain, parser as entities_parser
-from .normalize_module import normalize_datetime
-from .final_appointment_module import prepare_final_input, final_appointment
-from utils import safe_parse_llm_output
+import asyncio, os
+from datetime import datetime
+from typing import List
+import pytz
+from fastapi import APIRouter, Body, HTTPException, Response, Query
+from .models import PipelineInput
+from .pipeline_engine import text_pipeline, PipelineContext
+from cache import normalize_text
+from singleflight import pipeline_flight
+from admission import admission
 
 router = APIRouter()
 
+# Items extracted concurrently per batch request; LLM_MAX_CONCURRENCY still
+# caps the calls actually sent to Gemini.
+BATCH_CONCURRENCY = int(os.getenv("PIPELINE_BATCH_CONCURRENCY", "32"))
+BATCH_MAX_ITEMS = int(os.getenv("PIPELINE_BATCH_MAX_ITEMS", "1000"))
+
 @router.post("/pipeline/text")
-async def run_text_pipeline(data: PipelineInput = Body(...)):
+async def run_text_pipeline(response: Response, data: PipelineInput = Body(...), stream: bool = Query(False)):
     input_text = data.input_text
 
     if not input_text:
         raise HTTPException(status_code=400, detail="Text input must be provided")
 
-    #STEP 1: OCR/Text Extraction 
-    try:
-        raw_output = ocr_chain.run({"input_text": input_text})
-        extracted = safe_parse_llm_output(ocr_parser, raw_output)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Step 1 (OCR) failed: {e}")
-
-    # STEP 2: Entity Extraction 
-    try:
-        input_json = json.dumps({
-            "raw_text": extracted.get("raw_text", ""),
-            "confidence": extracted.get("confidence", 0.0)
-        })
-        entities_output = entities_chain.run({"input_json": input_json})
-        entities_result = safe_parse_llm_output(entities_parser, entities_output)
-
-        if "entities" in entities_result and isinstance(entities_result["entities"], str):
-            try:
-                entities_result["entities"] = json.loads(entities_result["entities"])
-            except:
-                entities_result["entities"] = {}
-        if "entities_confidence" in entities_result:
-            try:
-                entities_result["entities_confidence"] = float(entities_result["entities_confidence"])
-            except:
-                entities_result["entities_confidence"] = 0.0
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Step 2 (Entity Extraction) failed: {e}")
-
-    # STEP 3: Normalize Date/Time 
-    try:
-        normalized_result = normalize_datetime(EntitiesData(
-            entities=entities_result.get("entities", {}),
-            entities_confidence=entities_result.get("entities_confidence", 0.0)
-        ))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Step 3 (Normalization) failed: {e}")
-
-    # STEP 4: Prepare Final Input 
-    try:
-        combined_input = PrepareFinalInput(
-            normalized_output=normalized_result.get("normalized", {}),
-            entities_output=entities_result
-        )
-        prepared_input = prepare_final_input(combined_input)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Step 4 (Prepare Final Input) failed: {e}")
-
-    # STEP 5: Final Appointment 
-    try:
-        final_result = final_appointment(FinalInput(
-            normalized=prepared_input["normalized"],
-            entities=prepared_input["entities"]
-        ))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Step 5 (Final Appointment) failed: {e}")
-
-    return final_result
+    if stream:
+        ctx = PipelineContext(raw_text=input_text)
+        return await admission.streaming_response("text", text_pipeline.stream(ctx), media_type="application/x-ndjson")
+
+    # Identical requests in flight (client retries) share one run
+    result, server_timing = await pipeline_flight.do(("text", normalize_text(input_text)), run_text, input_text)
+    response.headers["Server-Timing"] = server_timing
+    return result
+
+async def run_text(input_text: str):
+    ctx = PipelineContext(raw_text=input_text)
+    async with admission.slot("text"):
+        result = await text_pipeline.run(ctx)
+    return result, ctx.server_timing()
+
+@router.post("/pipeline/text/batch")
+async def run_text_pipeline_batch(items: List[PipelineInput] = Body(...)):
+    if not items:
+        raise HTTPException(status_code=400, detail="At least one item must be provided")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds {BATCH_MAX_ITEMS} items")
+
+    async with admission.slot("batch"):
+        return await run_batch(items)
+
+async def run_batch(items: List[PipelineInput]):
+    contexts = [PipelineContext(raw_text=item.input_text) for item in items]
+    errors = {}
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    normalize_at = text_pipeline.index("normalize")
+
+    async def run_item(index, start=0, stop=None):
+        ctx = contexts[index]
+        if index in errors:
+            return
+        if not ctx.data["raw_text"]:
+            errors[index] = "Text input must be provided"
+            return
+        try:
+            await text_pipeline.run(ctx, start=start, stop=stop)
+        except HTTPException as e:
+            errors[index] = e.detail
+
+    # Extraction stages: one LLM-bound task per item, bounded concurrency
+    async def extract_item(index):
+        async with semaphore:
+            await run_item(index, stop=normalize_at)
+
+    await asyncio.gather(*(extract_item(i) for i in range(len(contexts))))
+
+    # Normalization and assembly are local; resolve every item against the same "now"
+    now = datetime.now(pytz.timezone("Asia/Kolkata"))
+    for i, ctx in enumerate(contexts):
+        ctx.data["now"] = now
+        await run_item(i, start=normalize_at)
+
+    results = []
+    for i, ctx in enumerate(contexts):
+        if i in errors:
+            results.append({"index": i, "status": "error", "detail": errors[i]})
+        else:
+            results.append({"index": i, **ctx.result})
+
+    return {
+        "count": len(results),
+        "failed": len(errors),
+        "results": results
+    }
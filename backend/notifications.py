@@ -0,0 +1,66 @@
+import json, os
+from datetime import datetime
+import pytz
+
+# log | file | memory
+NOTIFICATION_SINK = os.getenv("NOTIFICATION_SINK", "log")
+NOTIFICATION_FILE = os.getenv("NOTIFICATION_FILE", "/tmp/reminders.jsonl")
+
+
+class NotificationSink:
+    """
+    Delivers a batch of appointment reminders. Returns {task_id: delivered}.
+    Raising marks the whole batch for retry.
+    """
+    def send(self, appointments):
+        raise NotImplementedError
+
+
+class LogSink(NotificationSink):
+    def send(self, appointments):
+        now = datetime.now(pytz.timezone("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M:%S %Z")
+        for appointment in appointments:
+            print(f"[Scheduler] 🔔 Appointment triggered at {now}: {appointment}")
+        return {a["task_id"]: True for a in appointments}
+
+
+class FileSink(NotificationSink):
+    def __init__(self, path: str = NOTIFICATION_FILE):
+        self.path = path
+
+    def send(self, appointments):
+        now = datetime.now(pytz.utc).isoformat()
+        with open(self.path, "a") as f:
+            f.writelines(json.dumps({**a, "delivered_at": now}) + "\n" for a in appointments)
+        return {a["task_id"]: True for a in appointments}
+
+
+class MemorySink(NotificationSink):
+    """
+    Keeps delivered reminders in memory; for tests and benchmarks.
+    """
+    def __init__(self):
+        self.delivered = []
+
+    def send(self, appointments):
+        self.delivered.extend(appointments)
+        return {a["task_id"]: True for a in appointments}
+
+
+SINKS = {
+    "log": LogSink,
+    "file": FileSink,
+    "memory": MemorySink,
+}
+
+_sink = None
+
+def get_sink() -> NotificationSink:
+    global _sink
+    if _sink is None:
+        _sink = SINKS[NOTIFICATION_SINK]()
+    return _sink
+
+def set_sink(sink: NotificationSink):
+    global _sink
+    _sink = sink
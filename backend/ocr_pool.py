@@ -0,0 +1,160 @@
+import asyncio, io, multiprocessing, os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import metrics
+
+# OCR_WORKERS=0 runs EasyOCR on a single in-process thread (handy for dev)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+OCR_GPU = os.getenv("OCR_GPU", "true").lower() == "true"
+OCR_LANGUAGES = os.getenv("OCR_LANGUAGES", "en").split(",")
+# Images queued or in progress before new uploads are rejected
+OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", "16"))
+
+# Preprocessing: grayscale, crop to the text region, and downscale so the
+# typical glyph is about OCR_TARGET_TEXT_HEIGHT pixels tall
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "true").lower() == "true"
+OCR_TARGET_TEXT_HEIGHT = int(os.getenv("OCR_TARGET_TEXT_HEIGHT", "32"))
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "1600"))
+# Preprocessing never shrinks the text region's longer side below this
+OCR_MIN_SIDE = int(os.getenv("OCR_MIN_SIDE", str(OCR_MAX_SIDE // 4)))
+# Glyph-sized ink blobs needed before the image is treated as text
+OCR_MIN_GLYPHS = int(os.getenv("OCR_MIN_GLYPHS", "5"))
+
+NO_TEXT_FOUND = "No clear text found in image."
+
+# One warmed reader per worker process
+_reader = None
+_executor = None
+_pending = 0
+
+
+class OCRQueueFull(Exception):
+    pass
+
+
+def _init_worker(languages, gpu):
+    global _reader
+    import easyocr
+    _reader = easyocr.Reader(languages, gpu=gpu)
+
+def _ink_mask(gray):
+    import numpy as np
+
+    pixels = np.asarray(gray, dtype=np.uint8)
+    # Dark text on a lighter background; the threshold adapts to exposure
+    return pixels < min(int(pixels.mean()) - 30, 160)
+
+def _text_boxes(mask):
+    """
+    Bounding boxes (x, y, w, h) of connected ink blobs sized like glyphs.
+    Large regions such as a table around a photographed card, and solid
+    blocks, are dropped.
+    """
+    import cv2
+    import numpy as np
+
+    height, width = mask.shape
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+    boxes = stats[1:count]
+    x, y, w, h, area = boxes.T
+    fill = area / np.maximum(w * h, 1)
+    glyph = (h >= 4) & (h <= height / 8) & (w <= width / 4) & (fill > 0.05) & (fill < 0.9)
+    return boxes[glyph, :4]
+
+def preprocess(image):
+    """
+    Grayscale, crop to the text region and downscale. Never upscales, and
+    only crops or scales to text height when the ink looks like text.
+    """
+    import numpy as np
+    from PIL import Image
+
+    gray = image.convert("L")
+    boxes = _text_boxes(_ink_mask(gray))
+    scale = OCR_MAX_SIDE / max(gray.width, gray.height)
+
+    if len(boxes) >= OCR_MIN_GLYPHS:
+        pad = max(gray.width, gray.height) // 50
+        left, top = boxes[:, 0].min(), boxes[:, 1].min()
+        right, bottom = (boxes[:, 0] + boxes[:, 2]).max(), (boxes[:, 1] + boxes[:, 3]).max()
+        gray = gray.crop((max(int(left) - pad, 0), max(int(top) - pad, 0),
+                          min(int(right) + pad, gray.width), min(int(bottom) + pad, gray.height)))
+        scale = min(OCR_MAX_SIDE / max(gray.width, gray.height),
+                    OCR_TARGET_TEXT_HEIGHT / float(np.median(boxes[:, 3])))
+        # A bad height estimate must not shrink the image past legibility
+        scale = max(scale, min(OCR_MIN_SIDE / max(gray.width, gray.height), 1))
+
+    if scale < 1:
+        size = (max(int(gray.width * scale), 1), max(int(gray.height * scale), 1))
+        gray = gray.resize(size, Image.LANCZOS)
+    return gray
+
+def _decode(image_bytes: bytes):
+    import numpy as np
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(image_bytes))
+    if not OCR_PREPROCESS:
+        # EasyOCR expects OpenCV channel order
+        return np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1])
+
+    # Let the JPEG decoder shrink oversized photos while decoding
+    image.draft("L", (OCR_MAX_SIDE, OCR_MAX_SIDE))
+    return np.asarray(preprocess(image))
+
+def _recognize(image_bytes: bytes) -> str:
+    ocr_results = _reader.readtext(_decode(image_bytes))
+    raw_text = " ".join([text[1] for text in ocr_results]).strip()
+    return raw_text or NO_TEXT_FOUND
+
+def _ping():
+    return _reader is not None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        if OCR_WORKERS > 0:
+            # spawn: forking a process that has torch/uvicorn threads is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(OCR_LANGUAGES, OCR_GPU)
+            )
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=1,
+                initializer=_init_worker,
+                initargs=(OCR_LANGUAGES, OCR_GPU)
+            )
+    return _executor
+
+async def recognize(image_bytes: bytes) -> str:
+    """
+    Run OCR on the pool. Raises OCRQueueFull instead of queueing past
+    OCR_MAX_PENDING so text requests on the same backend stay responsive.
+    """
+    global _pending
+    if _pending >= OCR_MAX_PENDING:
+        raise OCRQueueFull(f"{_pending} images already queued for OCR")
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        with metrics.ocr_seconds.time():
+            return await loop.run_in_executor(get_executor(), _recognize, image_bytes)
+    finally:
+        _pending -= 1
+
+def warmup():
+    """
+    Start every worker and load its reader weights.
+    """
+    executor = get_executor()
+    futures = [executor.submit(_ping) for _ in range(max(OCR_WORKERS, 1))]
+    return all(f.result() for f in futures)
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,115 @@
+import asyncio, ipaddress, json, os, socket
+import urllib.request
+from urllib.parse import urlparse
+from celery_app import celery
+import job_store
+
+# Attempts to POST a finished job to its callback_url
+JOB_CALLBACK_RETRIES = int(os.getenv("JOB_CALLBACK_RETRIES", "3"))
+JOB_CALLBACK_TIMEOUT = float(os.getenv("JOB_CALLBACK_TIMEOUT", "10"))
+# Comma separated hosts callbacks may go to; empty allows any public host
+JOB_CALLBACK_ALLOWED_HOSTS = {h.strip().lower() for h in os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "").split(",") if h.strip()}
+# Jobs shed with a 429/503 (e.g. a busy OCR pool) are retried this many times
+JOB_MAX_RETRIES = int(os.getenv("JOB_MAX_RETRIES", "3"))
+
+# One event loop per worker process, reused across tasks so module-level
+# asyncio primitives (LLM semaphore, single-flight) stay bound to it
+_loop = None
+
+def run_async(coro):
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
+def check_callback_url(url: str):
+    """
+    Raise ValueError unless `url` is http(s) and its host is on
+    JOB_CALLBACK_ALLOWED_HOSTS or, with no allowlist, resolves only to
+    public addresses. Callbacks are sent from inside the deployment's
+    network, so internal services must not be reachable through them.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+    host = parsed.hostname.lower()
+    if JOB_CALLBACK_ALLOWED_HOSTS:
+        if host not in JOB_CALLBACK_ALLOWED_HOSTS:
+            raise ValueError(f"callback_url host {host} is not allowed")
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parsed.port or 443, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callback_url host {host} does not resolve")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%", 1)[0]).is_global:
+            raise ValueError(f"callback_url host {host} is not a public address")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect could point the POST at an internal address
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+@celery.task(name="post_job_callback", bind=True, max_retries=JOB_CALLBACK_RETRIES, ignore_result=True)
+def post_job_callback(self, url: str, body: dict):
+    """
+    POST a finished job to its callback_url. Runs on the default queue and
+    backs off through Celery, so no pipeline worker slot waits on it.
+    """
+    try:
+        # Checked again here: DNS may have changed since the job was submitted
+        check_callback_url(url)
+    except ValueError as e:
+        print(f"[Jobs] Callback to {url} dropped: {e}")
+        return
+    data = json.dumps(body, default=str).encode()
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with _opener.open(request, timeout=JOB_CALLBACK_TIMEOUT):
+            return
+    except Exception as e:
+        print(f"[Jobs] Callback to {url} failed (attempt {self.request.retries + 1}): {e}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=2 ** self.request.retries)
+
+def retry_after(e) -> int:
+    try:
+        return int((e.headers or {}).get("Retry-After"))
+    except (TypeError, ValueError):
+        return 5
+
+@celery.task(name="run_pipeline_job", bind=True, track_started=True, max_retries=JOB_MAX_RETRIES)
+def run_pipeline_job(self, kind: str, payload: dict, callback_url: str = None):
+    """
+    Run the text or image pipeline for a job submitted to /jobs. The return
+    value is what GET /jobs/{id} serves and what is POSTed to callback_url.
+    """
+    from fastapi import HTTPException
+    from modules.pipeline_engine import text_pipeline, image_pipeline, PipelineContext
+
+    image_ref = payload.get("image_ref")
+    try:
+        if kind == "image":
+            pipeline, ctx = image_pipeline, PipelineContext(image_bytes=job_store.get_image(image_ref))
+        else:
+            pipeline, ctx = text_pipeline, PipelineContext(raw_text=payload["input_text"])
+        result = run_async(pipeline.run(ctx))
+        outcome = {"status": "done", "result": result, "timings_ms": {
+            name: round(ms, 1) for name, ms in ctx.timings.items()
+        }}
+    except HTTPException as e:
+        if e.status_code in (429, 503) and self.request.retries < self.max_retries:
+            # Honour the stage's Retry-After, backing off on repeats
+            raise self.retry(countdown=min(retry_after(e) * 2 ** self.request.retries, 60))
+        outcome = {"status": "failed", "status_code": e.status_code, "detail": e.detail}
+    except KeyError:
+        outcome = {"status": "failed", "status_code": 410, "detail": "Uploaded image expired before the job ran"}
+
+    if image_ref:
+        job_store.delete_image(image_ref)
+    if callback_url:
+        post_job_callback.delay(callback_url, {"job_id": self.request.id, **outcome})
+    return outcome
@@ -0,0 +1,111 @@
+import math, os, time
+from collections import deque
+
+# Consecutive failed LLM calls that open the breaker, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# Hedging: a second request is sent when the first is slower than the
+# chain's recent p95 (never sooner than LLM_HEDGE_MIN_DELAY)
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+LLM_HEDGE_INITIAL_DELAY = float(os.getenv("LLM_HEDGE_INITIAL_DELAY", "3"))
+
+
+class LLMUnavailable(Exception):
+    """
+    The LLM could not answer in time: breaker open, deadline hit or upstream
+    errors. Callers fall back to the rule-based path or return 503.
+    """
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """
+    Quota or rate-limit errors (HTTP 429 / RESOURCE_EXHAUSTED). Hedging
+    these only doubles the load on an upstream that is already shedding.
+    """
+    for cls in type(error).__mro__:
+        if cls.__name__ in ("ResourceExhausted", "TooManyRequests", "RateLimitError"):
+            return True
+    if 429 in (getattr(error, "code", None), getattr(error, "status_code", None)):
+        return True
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or "quota" in message.lower()
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failures and rejects calls for
+    `reset_after` seconds, then lets a single probe through (half-open).
+    """
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, reset_after: float = LLM_BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def retry_after(self) -> int:
+        if self.opened_at is None:
+            return 1
+        return max(1, math.ceil(self.reset_after - (time.monotonic() - self.opened_at)))
+
+    def check(self):
+        state = self.state
+        if state == "open" or (state == "half_open" and self.probing):
+            raise LLMUnavailable("LLM circuit breaker is open", self.retry_after())
+        if state == "half_open":
+            self.probing = True
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.probing or self.consecutive_failures >= self.failures:
+            if self.state == "closed":
+                print(f"[LLM] Circuit breaker opened after {self.consecutive_failures} failures")
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+class LatencyTracker:
+    """
+    Recent successful call latencies per chain, for the hedge delay.
+    """
+
+    def __init__(self, window: int = LLM_HEDGE_WINDOW):
+        self.window = window
+        self._samples = {}
+
+    def record(self, name: str, seconds: float):
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def hedge_delay(self, name: str) -> float:
+        samples = self._samples.get(name)
+        if not samples or len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_INITIAL_DELAY
+        ordered = sorted(samples)
+        return max(ordered[int(0.95 * (len(ordered) - 1))], LLM_HEDGE_MIN_DELAY)
+
+
+llm_breaker = CircuitBreaker()
+llm_latency = LatencyTracker()
@@ -0,0 +1,100 @@
+import os
+from threading import Lock
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+
+_llm = None
+_lock = Lock()
+
+def get_llm():
+    """
+    Shared chat model, created on first use so importing the app stays cheap.
+    """
+    global _llm
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+                if not api_key:
+                    raise ValueError("Please set GOOGLE_API_KEY in .env file")
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                _llm = ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=0)
+    return _llm
+
+def set_llm(llm):
+    """
+    Replace the shared model (e.g. with a stub). Chains built afterwards use it.
+    """
+    global _llm
+    _llm = llm
+    for lazy_chain in LazyChain.instances:
+        lazy_chain.reset()
+
+
+class LazyChain:
+    """
+    Prompt, structured output parser and LLMChain for one step, built on
+    first access. `response_schemas` is a list of (name, description).
+    """
+    instances = []
+
+    def __init__(self, template: str, input_variables, response_schemas):
+        self.template = template
+        self.input_variables = input_variables
+        self.response_schemas = response_schemas
+        self._parser = None
+        self._chain = None
+        LazyChain.instances.append(self)
+
+    @property
+    def parser(self):
+        if self._parser is None:
+            from langchain.output_parsers import StructuredOutputParser, ResponseSchema
+            self._parser = StructuredOutputParser.from_response_schemas([
+                ResponseSchema(name=name, description=description)
+                for name, description in self.response_schemas
+            ])
+        return self._parser
+
+    @property
+    def chain(self):
+        if self._chain is None:
+            from langchain.prompts import PromptTemplate
+            from langchain.chains import LLMChain
+            prompt = PromptTemplate(
+                template=self.template,
+                input_variables=self.input_variables,
+                partial_variables={"format_instructions": self.parser.get_format_instructions()}
+            )
+            self._chain = LLMChain(llm=get_llm(), prompt=prompt)
+        return self._chain
+
+    def reset(self):
+        self._chain = None
+
+class LazyStructuredChain(LazyChain):
+    """
+    Prompt piped into the model's native JSON-schema output. The chain
+    returns {"raw": message, "parsed": schema instance or None, "parsing_error"}.
+    """
+
+    def __init__(self, template: str, input_variables, schema):
+        super().__init__(template, input_variables, response_schemas=[])
+        self.schema = schema
+
+    @property
+    def chain(self):
+        if self._chain is None:
+            from langchain.prompts import PromptTemplate
+            prompt = PromptTemplate(template=self.template, input_variables=self.input_variables)
+            self._chain = prompt | get_llm().with_structured_output(
+                self.schema, method="json_mode", include_raw=True
+            )
+        return self._chain
+
+def warmup_llm():
+    for lazy_chain in LazyChain.instances:
+        lazy_chain.chain
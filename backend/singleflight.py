@@ -0,0 +1,36 @@
+import asyncio
+import metrics
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one in-flight execution and
+    its result (or exception). Waiters are shielded, so a client that
+    disconnects does not cancel the work for the others. Results are shared
+    objects; callers must not mutate them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+
+    async def do(self, key, func, *args):
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics.flight_calls.inc(flight=self.name, outcome="coalesced")
+        else:
+            metrics.flight_calls.inc(flight=self.name, outcome="leader")
+            task = asyncio.ensure_future(func(*args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._inflight)
+
+
+# Whole /pipeline/text and /pipeline/image runs, keyed on the normalized input
+pipeline_flight = SingleFlight("pipeline")
+
+# Individual LLM and OCR stages, keyed like their cache entries
+stage_flight = SingleFlight("stage")
@@ -0,0 +1,4 @@
+import os, sys
+
+# Tests import the backend's top-level modules the way uvicorn and celery do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from admission import AdmissionController, RequestClass
+
+
+def make_controller(max_active=1, queue_size=1, deadline=0.2):
+    return AdmissionController([
+        RequestClass("text", priority=0, max_active=max_active, queue_size=queue_size, deadline=deadline),
+        RequestClass("batch", priority=1, max_active=max_active, queue_size=queue_size, deadline=deadline),
+    ], max_active=max_active)
+
+
+def assert_idle(controller):
+    assert controller.active == 0
+    for cls in controller.classes.values():
+        assert cls.active == 0
+        assert not cls.waiters
+
+
+def test_slot_released_on_error():
+    controller = make_controller()
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            async with controller.slot("text"):
+                raise RuntimeError("boom")
+
+    asyncio.run(main())
+    assert_idle(controller)
+
+
+def test_full_queue_rejected_with_429():
+    controller = make_controller(queue_size=1)
+
+    async def main():
+        async with controller.slot("text"):
+            waiter = asyncio.ensure_future(controller.acquire("text"))
+            await asyncio.sleep(0)
+            with pytest.raises(HTTPException) as e:
+                await controller.acquire("text")
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        return e.value
+
+    error = asyncio.run(main())
+    assert error.status_code == 429
+    assert int(error.headers["Retry-After"]) >= 1
+    assert_idle(controller)
+
+
+def test_deadline_rejected_with_503_without_leaking():
+    controller = make_controller(deadline=0.05)
+
+    async def main():
+        async with controller.slot("text"):
+            with pytest.raises(HTTPException) as e:
+                await controller.acquire("text")
+        return e.value
+
+    assert asyncio.run(main()).status_code == 503
+    assert_idle(controller)
+
+
+def test_cancelled_waiter_does_not_leak():
+    controller = make_controller(deadline=5)
+
+    async def main():
+        async with controller.slot("text"):
+            waiter = asyncio.ensure_future(controller.acquire("text"))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+
+    asyncio.run(main())
+    assert_idle(controller)
+
+
+def test_higher_priority_admitted_first():
+    controller = make_controller(deadline=5)
+    order = []
+
+    async def run(name):
+        async with controller.slot(name):
+            order.append(name)
+
+    async def main():
+        async with controller.slot("text"):
+            batch = asyncio.ensure_future(run("batch"))
+            await asyncio.sleep(0)
+            text = asyncio.ensure_future(run("text"))
+            await asyncio.sleep(0)
+        await asyncio.gather(batch, text)
+
+    asyncio.run(main())
+    assert order == ["text", "batch"]
+    assert_idle(controller)
+
+
+async def body(fail):
+    yield b"first\n"
+    if fail:
+        raise RuntimeError("stage blew up")
+    yield b"second\n"
+
+
+async def send_response(response, disconnect):
+    async def send(message):
+        if disconnect and message["type"] == "http.response.body":
+            raise OSError("client went away")
+
+    async def receive():
+        await asyncio.sleep(10)
+        return {"type": "http.disconnect"}
+
+    await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+
+
+@pytest.mark.parametrize("fail, disconnect", [(False, False), (True, False), (False, True)],
+                         ids=["completed", "generator_error", "client_disconnect"])
+def test_streaming_slot_released(fail, disconnect):
+    controller = make_controller()
+
+    async def main():
+        response = await controller.streaming_response("text", body(fail), media_type="application/x-ndjson")
+        assert controller.active == 1
+        try:
+            await send_response(response, disconnect)
+        except Exception:
+            pass
+
+    asyncio.run(main())
+    assert_idle(controller)
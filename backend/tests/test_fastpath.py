@@ -0,0 +1,31 @@
+import pytest
+from modules.fastpath_module import try_fast_extract
+
+
+@pytest.mark.parametrize("text, date_phrase, time_phrase, department", [
+    ("Book dentist tomorrow 5pm", "tomorrow", "5pm", "dentist"),
+    ("Need a cardiology appointment next Monday at 10:30 am", "next monday", "10:30 am", "cardiology"),
+    ("appointment with ENT next wed 4:15pm", "next wednesday", "4:15pm", "ent"),
+    ("neurology consult 2025-12-03 14:00", "2025-12-03", "14:00", "neurology"),
+])
+def test_accepts_plain_requests(text, date_phrase, time_phrase, department):
+    result = try_fast_extract(text)
+    assert result is not None
+    assert result["entities"] == {"date_phrase": date_phrase, "time_phrase": time_phrase, "department": department}
+
+
+@pytest.mark.parametrize("text", [
+    "Can I see the orthopedics doctor day after tomorrow at 11am",
+    "cant do tomorrow, book dentist on friday 3pm",
+    "not tomorrow, dentist next friday 3pm",
+    "dentist tomorrow 5pm or the day before",
+    "dentist next week tomorrow 5pm",
+    "dentist or cardiologist tomorrow 5pm",
+    "dentist tomorrow 5pm or 6pm",
+    "dentist on friday 3pm",
+    "dentist tomorrow",
+    "tomorrow at 5pm",
+    "",
+])
+def test_rejects_ambiguous_requests(text):
+    assert try_fast_extract(text) is None
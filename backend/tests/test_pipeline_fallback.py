@@ -0,0 +1,37 @@
+import asyncio
+import pytest
+from resilience import LLMUnavailable
+from modules import pipeline_engine
+from modules.pipeline_engine import PipelineContext, PipelineHalt, extract_text_stage, entities_stage
+
+
+async def unavailable(*args):
+    raise LLMUnavailable("breaker open")
+
+
+@pytest.fixture(autouse=True)
+def llm_down(monkeypatch):
+    monkeypatch.setattr(pipeline_engine, "EXTRACTION_MODE", "split")
+    monkeypatch.setattr(pipeline_engine, "aextract_text", unavailable)
+    monkeypatch.setattr(pipeline_engine, "aextract_entities", unavailable)
+
+
+def test_low_confidence_extract_fallback_asks_for_clarification():
+    ctx = PipelineContext(raw_text="dentist or cardiologist tomorrow 5pm")
+    with pytest.raises(PipelineHalt) as e:
+        asyncio.run(extract_text_stage(ctx))
+    assert e.value.response["status"] == "needs_clarification"
+    assert "entities_result" not in ctx.data
+
+
+def test_low_confidence_entities_fallback_asks_for_clarification():
+    ctx = PipelineContext(extracted={"raw_text": "dentist the day after tomorrow at 5pm", "confidence": 0.9})
+    with pytest.raises(PipelineHalt) as e:
+        asyncio.run(entities_stage(ctx))
+    assert e.value.response["status"] == "needs_clarification"
+
+
+def test_confident_entities_fallback_is_used():
+    ctx = PipelineContext(extracted={"raw_text": "dentist tomorrow at 5pm", "confidence": 0.9})
+    result = asyncio.run(entities_stage(ctx))
+    assert result["entities"]["department"] == "dentist"
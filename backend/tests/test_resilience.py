@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+import resilience
+import utils
+from resilience import CircuitBreaker, LatencyTracker, LLMUnavailable
+
+
+class Chain:
+    """
+    Stand-in for an LLMChain/runnable: sleeps, then returns or raises.
+    """
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.calls = 0
+
+    async def ainvoke(self, inputs, config=None):
+        delay, error = self.steps[min(self.calls, len(self.steps) - 1)]
+        self.calls += 1
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return "ok"
+
+
+class TooManyRequests(Exception):
+    pass
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """
+    Fresh semaphore, breaker and latency tracker; short deadlines.
+    """
+    state = type("State", (), {})()
+    state.slots = 2
+    monkeypatch.setattr(utils, "_llm_semaphore", asyncio.Semaphore(state.slots))
+    monkeypatch.setattr(utils, "llm_breaker", CircuitBreaker(failures=2, reset_after=0.05))
+    monkeypatch.setattr(utils, "llm_latency", LatencyTracker())
+    monkeypatch.setattr(utils, "LLM_HEDGE", True)
+    monkeypatch.setattr(utils, "LLM_TIMEOUT_SECONDS", 0.3)
+    monkeypatch.setattr(utils, "LLM_QUEUE_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(resilience, "LLM_HEDGE_INITIAL_DELAY", 0.02)
+    return state
+
+
+def permits_free(state):
+    return utils._llm_semaphore._value == state.slots
+
+
+def test_breaker_opens_and_lets_one_probe_through():
+    breaker = CircuitBreaker(failures=2, reset_after=0.05)
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    with pytest.raises(LLMUnavailable):
+        breaker.check()
+
+    import time
+    time.sleep(0.06)
+    breaker.check()  # the probe
+    with pytest.raises(LLMUnavailable):
+        breaker.check()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failures_open_breaker_and_release_permits(llm):
+    chain = Chain((0, ValueError("bad gateway")))
+
+    async def main():
+        for _ in range(2):
+            with pytest.raises(LLMUnavailable):
+                await utils.arun_chain(chain, {}, "test")
+
+    asyncio.run(main())
+    assert utils.llm_breaker.state == "open"
+    assert permits_free(llm)
+
+
+def test_queue_timeout_does_not_count_against_breaker(llm):
+    slow = Chain((0.2, None))
+
+    async def main():
+        busy = [asyncio.ensure_future(utils.arun_chain(slow, {}, "test")) for _ in range(llm.slots)]
+        await asyncio.sleep(0)
+        with pytest.raises(LLMUnavailable):
+            await utils.arun_chain(slow, {}, "test")
+        await asyncio.gather(*busy)
+
+    asyncio.run(main())
+    assert utils.llm_breaker.consecutive_failures == 0
+    assert utils.llm_breaker.state == "closed"
+    assert permits_free(llm)
+
+
+def test_slow_call_is_hedged_and_hedge_permit_returned(llm):
+    chain = Chain((0.2, None), (0, None))
+
+    async def main():
+        return await utils.arun_chain(chain, {}, "test")
+
+    assert asyncio.run(main()) == "ok"
+    assert chain.calls == 2
+    assert permits_free(llm)
+
+
+def test_rate_limit_is_not_hedged(llm):
+    chain = Chain((0, TooManyRequests("429 RESOURCE_EXHAUSTED")), (0, None))
+
+    async def main():
+        with pytest.raises(LLMUnavailable):
+            await utils.arun_chain(chain, {}, "test")
+
+    asyncio.run(main())
+    assert chain.calls == 1
+    assert permits_free(llm)
+
+
+def test_deadline_releases_permits(llm):
+    chain = Chain((1, None))
+
+    async def main():
+        with pytest.raises(LLMUnavailable):
+            await utils.arun_chain(chain, {}, "test")
+
+    asyncio.run(main())
+    assert permits_free(llm)
@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", work, 21) for _ in range(5)))
+
+    assert asyncio.run(main()) == [42] * 5
+    assert calls == [21]
+    assert len(flight) == 0
+
+
+def test_exception_shared_and_key_cleared():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("nope")
+
+    async def main():
+        results = await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+        return results
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert len(flight) == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_run():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+    assert len(flight) == 0
@@ -1,6 +1,18 @@
-import json
+import asyncio, json, os, time
+import metrics
+from resilience import LLMUnavailable, llm_breaker, llm_latency, is_rate_limited
 
-def safe_parse_llm_output(parser, output_text):
+# Upper bound on LLM calls in flight per backend process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+_llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+# Deadline for one chain call, hedge included; starts once a slot is free
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+# Longest wait for a free slot. Running out is local overload, not an LLM
+# failure, so it does not count against the circuit breaker.
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "true").lower() == "true"
+
+def safe_parse_llm_output(parser, output_text, name: str = "llm"):
     """
     Parse LLM output safely and fallback to raw JSON cleaning if needed.
     """
@@ -9,6 +21,82 @@ def safe_parse_llm_output(parser, output_text):
     except Exception:
         cleaned = output_text.strip().replace("```json", "").replace("```", "").strip()
         try:
-            return json.loads(cleaned)
+            result = json.loads(cleaned)
+            metrics.llm_parse_failures.inc(chain=name, outcome="json_fallback")
+            return result
         except:
+            metrics.llm_parse_failures.inc(chain=name, outcome="failed")
             return {"status": "parse_failed", "raw_output": output_text}
+
+async def _invoke(chain, inputs: dict, name: str) -> str:
+    # Caller holds an _llm_semaphore slot
+    began = time.perf_counter()
+    result = await chain.ainvoke(inputs, config={"callbacks": [metrics.token_usage_callback(name)]})
+    elapsed = time.perf_counter() - began
+    metrics.llm_seconds.observe(elapsed, chain=name)
+    llm_latency.record(name, elapsed)
+    # LLMChain returns a dict keyed by output_key; runnables return their output
+    output_key = getattr(chain, "output_key", None)
+    return result[output_key] if output_key else result
+
+async def _hedged(chain, inputs: dict, name: str) -> str:
+    """
+    Send a second request if the first is slower than the chain's recent
+    p95 or fails; return whichever succeeds first. The hedge only runs on a
+    spare slot and never after a rate-limit error.
+    """
+    first = asyncio.ensure_future(_invoke(chain, inputs, name))
+    tasks = [first]
+    hedge_slot = False
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=llm_latency.hedge_delay(name))
+        if first in done and (first.exception() is None or is_rate_limited(first.exception())):
+            return first.result()
+        if _llm_semaphore.locked():
+            # No spare capacity; a hedge would only queue behind other calls
+            return await first
+
+        await _llm_semaphore.acquire()
+        hedge_slot = True
+        metrics.llm_hedges.inc(chain=name)
+        tasks.append(asyncio.ensure_future(_invoke(chain, inputs, name)))
+        pending = {t for t in tasks if not t.done()}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        raise tasks[-1].exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        if hedge_slot:
+            _llm_semaphore.release()
+
+async def arun_chain(chain, inputs: dict, name: str = "llm"):
+    """
+    Run an LLMChain (or runnable) without blocking the event loop, waiting up to
+    LLM_QUEUE_TIMEOUT_SECONDS for a free slot when LLM_MAX_CONCURRENCY calls
+    are already outstanding. Once it has a slot, each call gets
+    LLM_TIMEOUT_SECONDS, including a hedged second request, and goes through
+    the shared circuit breaker. Raises LLMUnavailable on any failure.
+    Latency and token usage are recorded under `name`.
+    """
+    try:
+        await asyncio.wait_for(_llm_semaphore.acquire(), LLM_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        metrics.llm_queue_timeouts.inc(chain=name)
+        raise LLMUnavailable(f"{name} LLM call queued longer than {LLM_QUEUE_TIMEOUT_SECONDS:g}s")
+    try:
+        llm_breaker.check()
+        call = _hedged(chain, inputs, name) if LLM_HEDGE else _invoke(chain, inputs, name)
+        try:
+            output = await asyncio.wait_for(call, LLM_TIMEOUT_SECONDS)
+        except Exception as e:
+            llm_breaker.record_failure()
+            metrics.llm_failures.inc(chain=name, reason=type(e).__name__)
+            raise LLMUnavailable(f"{name} LLM call failed: {e!r}", llm_breaker.retry_after()) from e
+        llm_breaker.record_success()
+        return output
+    finally:
+        _llm_semaphore.release()
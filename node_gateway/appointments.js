@@ -6,7 +6,7 @@ const PYTHON_API_BASE = process.env.PYTHON_API_BASE || "http://backend:8000";
 
 router.get("/appointments", async (req, res, next) => {
   try {
-    const response = await axios.get(`${PYTHON_API_BASE}/appointments`);
+    const response = await axios.get(`${PYTHON_API_BASE}/appointments`, { params: req.query });
     res.json(response.data);
   } catch (err) {
     console.error("appointments error:", err.message);
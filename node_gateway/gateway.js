@@ -6,6 +6,7 @@ import FormData from "form-data";
 import dotenv from "dotenv";
 import docsRoutes from "./docs.js";
 import appointmentRoutes from "./appointments.js";
+import jobRoutes from "./jobs.js";
 import { requestLogger, poweredByHeader, errorHandler } from "./middlewares.js";
 
 const app = express();
@@ -189,6 +190,7 @@ app.post("/pipeline/image", upload.single("file"), async (req, res) => {
 
 app.use(docsRoutes);
 app.use(appointmentRoutes);
+app.use(jobRoutes);
 
   // Start server
   app.listen(PORT, () => {
@@ -0,0 +1,57 @@
+import express from "express";
+import axios from "axios";
+import multer from "multer";
+import FormData from "form-data";
+
+const router = express.Router();
+const upload = multer();
+const PYTHON_API_BASE = process.env.PYTHON_API_BASE || "http://backend:8000";
+
+function forwardError(res, err, name) {
+  console.error(`${name} error:`, err.message);
+  res.status(err.response?.status || 500).json({
+    error: err.response?.data || `${name} request failed`,
+  });
+}
+
+router.post("/jobs/pipeline/text", async (req, res) => {
+  try {
+    const response = await axios.post(`${PYTHON_API_BASE}/jobs/pipeline/text`, req.body);
+    res.status(response.status).json(response.data);
+  } catch (err) {
+    forwardError(res, err, "jobs/pipeline/text");
+  }
+});
+
+router.post("/jobs/pipeline/image", upload.single("file"), async (req, res) => {
+  try {
+    if (!req.file) {
+      return res.status(400).json({ error: "No file uploaded" });
+    }
+
+    const formData = new FormData();
+    formData.append("file", req.file.buffer, req.file.originalname);
+    if (req.body.callback_url) {
+      formData.append("callback_url", req.body.callback_url);
+    }
+
+    const response = await axios.post(`${PYTHON_API_BASE}/jobs/pipeline/image`, formData, {
+      headers: { ...formData.getHeaders() },
+      maxBodyLength: Infinity,
+    });
+    res.status(response.status).json(response.data);
+  } catch (err) {
+    forwardError(res, err, "jobs/pipeline/image");
+  }
+});
+
+router.get("/jobs/:jobId", async (req, res) => {
+  try {
+    const response = await axios.get(`${PYTHON_API_BASE}/jobs/${encodeURIComponent(req.params.jobId)}`);
+    res.json(response.data);
+  } catch (err) {
+    forwardError(res, err, "jobs");
+  }
+});
+
+export default router;